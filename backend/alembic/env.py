@@ -12,7 +12,7 @@ from alembic import context
 
 # Import our models and database base
 from app.core.database import Base
-from app.models import user, tenant, odoo_instance, billing, audit_log
+from app.models import user, tenant, odoo_instance, billing, audit_log, backup
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
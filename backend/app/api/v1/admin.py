@@ -26,7 +26,7 @@ async def admin_dashboard(
     total_users = await db.scalar(select(func.count(User.id)))
     total_tenants = await db.scalar(select(func.count(Tenant.id)))
     active_instances = await db.scalar(
-        select(func.count(OdooInstance.id)).where(OdooInstance.is_active == True)
+        select(func.count(OdooInstance.id)).where(OdooInstance.is_active)
     )
     total_revenue = await db.scalar(
         select(func.sum(BillingRecord.amount)).where(BillingRecord.status == "paid")
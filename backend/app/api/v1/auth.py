@@ -1,7 +1,7 @@
 """
 Authentication API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -56,6 +56,7 @@ async def login(
 @router.post("/register", response_model=UserResponse)
 async def register(
     user_data: UserCreate,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """User registration endpoint"""
@@ -66,8 +67,8 @@ async def register(
         # Create new user
         user = await user_service.create_user(user_data)
         
-        # Send verification email
-        await email_service.send_verification_email(user)
+        # Send verification email after the response
+        await email_service.send_verification_email(user, background_tasks)
         
         return UserResponse(
             id=user.id,
@@ -106,6 +107,7 @@ async def verify_email(
 
 @router.post("/resend-verification")
 async def resend_verification(
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -117,7 +119,7 @@ async def resend_verification(
         )
     
     email_service = EmailService(db)
-    success = await email_service.send_verification_email(current_user)
+    success = await email_service.send_verification_email(current_user, background_tasks)
     
     if not success:
         raise HTTPException(
@@ -130,13 +132,14 @@ async def resend_verification(
 @router.post("/forgot-password")
 async def forgot_password(
     request: PasswordResetRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """Request password reset"""
     email_service = EmailService(db)
     
     # Always return success to prevent email enumeration
-    await email_service.send_password_reset_email(request.email)
+    await email_service.send_password_reset_email(request.email, background_tasks)
     
     return {"message": "If the email exists, a password reset link has been sent"}
 
@@ -1,19 +1,21 @@
 """
 Billing API endpoints for subscription management with Stripe integration
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
+from sqlalchemy.dialects.postgresql import insert
 from typing import List, Optional
 from datetime import datetime, timedelta
 import stripe
 import os
 from pydantic import BaseModel
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
-from app.models.billing import BillingRecord, Subscription, PaymentMethod
+from app.models.billing import BillingRecord, Subscription, PaymentMethod, StripeEvent
 from app.models.tenant import Tenant
 from app.services.billing import BillingService
 
@@ -489,14 +491,34 @@ async def get_usage_metrics(
 
 @router.post("/webhooks/stripe")
 async def stripe_webhook(
-    request: dict,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
     """Handle Stripe webhooks"""
-    # Verify webhook signature (implement signature verification)
-    event_type = request.get("type")
-    data = request.get("data", {}).get("object", {})
+    # Verify the webhook signature against the raw payload
+    payload = await request.body()
+    try:
+        event = stripe.Webhook.construct_event(
+            payload,
+            request.headers.get("stripe-signature"),
+            settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.error.SignatureVerificationError):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+    
+    # Stripe redelivers events, each one is handled once. The marker row is
+    # committed together with the handler's changes at the end of the request
+    result = await db.execute(
+        insert(StripeEvent)
+        .values(id=event["id"], event_type=event["type"])
+        .on_conflict_do_nothing(index_elements=[StripeEvent.id])
+    )
+    if result.rowcount == 0:
+        return {"status": "duplicate"}
+    
+    event_type = event["type"]
+    data = event["data"]["object"]
     
     billing_service = BillingService(db)
     
@@ -510,4 +532,3 @@ async def stripe_webhook(
         await billing_service.handle_subscription_deleted(data)
     
     return {"status": "success"}
-
@@ -5,11 +5,12 @@ from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from app.core.database import get_db
 from app.core.security import get_current_user, require_admin
 from app.models.user import User
-from app.services.monitoring import MonitoringService
+from app.services.monitoring import MonitoringService, sample_system
 
 router = APIRouter()
 
@@ -37,12 +38,9 @@ async def get_prometheus_metrics(
 ) -> Response:
     """Get Prometheus metrics in text format"""
     monitoring_service = MonitoringService(db)
-    metrics_text = monitoring_service.get_prometheus_metrics()
+    metrics = await monitoring_service.get_prometheus_metrics()
     
-    return Response(
-        content=metrics_text,
-        media_type="text/plain; version=0.0.4; charset=utf-8"
-    )
+    return Response(content=metrics, media_type=CONTENT_TYPE_LATEST)
 
 @router.get("/instances/{instance_id}/metrics")
 async def get_instance_metrics(
@@ -148,9 +146,8 @@ async def get_system_resources(
     """Get current system resource usage"""
     import psutil
     
-    cpu_percent = psutil.cpu_percent(interval=1)
-    memory = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
+    # Shared non-blocking sample, CPU is measured since the previous sample
+    cpu_percent, memory, disk = await sample_system()
     
     # Get network stats
     network = psutil.net_io_counters()
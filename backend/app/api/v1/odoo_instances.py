@@ -13,6 +13,7 @@ from app.models.tenant import Tenant
 from app.models.odoo_instance import OdooInstance
 from app.services.tenant import TenantService
 from app.services.admin_service import AdminService
+from app.services.odoo_manager import instance_manager
 from app.schemas.odoo_instance import (
     OdooInstanceCreate, OdooInstanceResponse, OdooInstanceUpdate,
     InstanceStatsResponse, InstanceBackupCreate, InstanceBackupResponse,
@@ -286,11 +287,13 @@ async def delete_instance(
             detail="Instance not found"
         )
     
-    # TODO: Stop and remove Docker container
-    
-    # Delete instance record
-    await db.delete(instance)
-    await db.commit()
+    # Remove the container, its volumes and the record on the request's session.
+    # Without Docker or a container only the record and its port are removed
+    if not await instance_manager.delete_instance(instance_id, db):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to delete instance"
+        )
     
     return {"message": "Instance deleted successfully"}
 
@@ -320,8 +323,23 @@ async def start_instance(
             detail="Instance not found"
         )
     
-    # TODO: Start Docker container
-    # background_tasks.add_task(start_docker_container, instance_id)
+    if not instance_manager.docker_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Docker is not available"
+        )
+    
+    if not instance.container_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Instance has no container"
+        )
+    
+    if not await instance_manager.start_instance(instance_id, db):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start instance"
+        )
     
     return {"message": "Instance start initiated"}
 
@@ -350,8 +368,23 @@ async def stop_instance(
             detail="Instance not found"
         )
     
-    # TODO: Stop Docker container
-    # background_tasks.add_task(stop_docker_container, instance_id)
+    if not instance_manager.docker_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Docker is not available"
+        )
+    
+    if not instance.container_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Instance has no container"
+        )
+    
+    if not await instance_manager.stop_instance(instance_id, db):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to stop instance"
+        )
     
     return {"message": "Instance stop initiated"}
 
@@ -380,8 +413,23 @@ async def restart_instance(
             detail="Instance not found"
         )
     
-    # TODO: Restart Docker container
-    # background_tasks.add_task(restart_docker_container, instance_id)
+    if not instance_manager.docker_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Docker is not available"
+        )
+    
+    if not instance.container_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Instance has no container"
+        )
+    
+    if not await instance_manager.restart_instance(instance_id, db):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to restart instance"
+        )
     
     return {"message": "Instance restart initiated"}
 
@@ -10,7 +10,7 @@ from app.core.security import get_current_user, get_current_admin_user
 from app.models.user import User
 from app.services.tenant import TenantService
 from app.services.admin_service import AdminService
-from app.schemas.tenant import TenantCreate, TenantResponse, TenantUpdate, TenantStats
+from app.schemas.tenant import TenantCreate, TenantResponse, TenantUpdate, TenantStats, TenantList
 
 router = APIRouter()
 
@@ -31,21 +31,7 @@ async def create_tenant(
         # TODO: Add background task to create Odoo instance
         # background_tasks.add_task(create_odoo_instance, tenant.id)
         
-        return TenantResponse(
-            id=tenant.id,
-            name=tenant.name,
-            description=tenant.description,
-            owner_id=tenant.owner_id,
-            status=tenant.status,
-            is_active=tenant.is_active,
-            max_instances=tenant.max_instances,
-            max_users=tenant.max_users,
-            storage_limit_gb=tenant.storage_limit_gb,
-            storage_used_gb=tenant.storage_used_gb,
-            last_activity=tenant.last_activity,
-            created_at=tenant.created_at,
-            updated_at=tenant.updated_at
-        )
+        return TenantResponse.model_validate(tenant)
         
     except ValueError as e:
         raise HTTPException(
@@ -62,24 +48,7 @@ async def list_my_tenants(
     tenant_service = TenantService(db)
     tenants = await tenant_service.get_user_tenants(current_user.id)
     
-    return [
-        TenantResponse(
-            id=tenant.id,
-            name=tenant.name,
-            description=tenant.description,
-            owner_id=tenant.owner_id,
-            status=tenant.status,
-            is_active=tenant.is_active,
-            max_instances=tenant.max_instances,
-            max_users=tenant.max_users,
-            storage_limit_gb=tenant.storage_limit_gb,
-            storage_used_gb=tenant.storage_used_gb,
-            last_activity=tenant.last_activity,
-            created_at=tenant.created_at,
-            updated_at=tenant.updated_at
-        )
-        for tenant in tenants
-    ]
+    return TenantList.validate_python(tenants)
 
 @router.get("/{tenant_id}", response_model=TenantResponse)
 async def get_tenant(
@@ -97,21 +66,7 @@ async def get_tenant(
             detail="Tenant not found"
         )
     
-    return TenantResponse(
-        id=tenant.id,
-        name=tenant.name,
-        description=tenant.description,
-        owner_id=tenant.owner_id,
-        status=tenant.status,
-        is_active=tenant.is_active,
-        max_instances=tenant.max_instances,
-        max_users=tenant.max_users,
-        storage_limit_gb=tenant.storage_limit_gb,
-        storage_used_gb=tenant.storage_used_gb,
-        last_activity=tenant.last_activity,
-        created_at=tenant.created_at,
-        updated_at=tenant.updated_at
-    )
+    return TenantResponse.model_validate(tenant)
 
 @router.put("/{tenant_id}", response_model=TenantResponse)
 async def update_tenant(
@@ -131,21 +86,7 @@ async def update_tenant(
             detail="Tenant not found"
         )
     
-    return TenantResponse(
-        id=tenant.id,
-        name=tenant.name,
-        description=tenant.description,
-        owner_id=tenant.owner_id,
-        status=tenant.status,
-        is_active=tenant.is_active,
-        max_instances=tenant.max_instances,
-        max_users=tenant.max_users,
-        storage_limit_gb=tenant.storage_limit_gb,
-        storage_used_gb=tenant.storage_used_gb,
-        last_activity=tenant.last_activity,
-        created_at=tenant.created_at,
-        updated_at=tenant.updated_at
-    )
+    return TenantResponse.model_validate(tenant)
 
 @router.delete("/{tenant_id}")
 async def delete_tenant(
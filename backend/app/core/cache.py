@@ -0,0 +1,36 @@
+"""
+Redis cache client and helpers
+"""
+from typing import Optional
+import logging
+
+import redis.asyncio as redis
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Shared client, connections are opened lazily from its pool
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+async def cache_get(key: str) -> Optional[str]:
+    """Get a cached value, a cache outage is treated as a miss"""
+    try:
+        return await redis_client.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache read failed for {key}: {e}")
+        return None
+
+async def cache_set(key: str, value: str, ttl: int):
+    """Cache a value for ttl seconds, errors are logged and ignored"""
+    try:
+        await redis_client.set(key, value, ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+async def cache_delete(key: str):
+    """Drop a cached value, errors are logged and ignored"""
+    try:
+        await redis_client.delete(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache delete failed for {key}: {e}")
@@ -1,21 +1,34 @@
 """
 Database configuration and session management
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import DDL, event, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncAttrs
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
+from contextlib import suppress
+from datetime import date
+import asyncio
 import logging
+import re
 
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
-# Create async engine
+# Create async engine, the pool class is spelled out since a plain QueuePool
+# blocks the event loop while waiting for a connection
 engine = create_async_engine(
     settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
+    poolclass=AsyncAdaptedQueuePool,
     pool_size=20,
     max_overflow=30,
     pool_pre_ping=True,
+    pool_recycle=1800,
+    query_cache_size=1200,
+    # The asyncpg adapter prepares every statement itself, keep more of the
+    # prepared statements per connection than the default 100
+    connect_args={"prepared_statement_cache_size": 500},
     echo=settings.DEBUG
 )
 
@@ -26,8 +39,148 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
-# Create base class for models
-Base = declarative_base()
+# Create base class for models, AsyncAttrs allows awaiting lazy attributes
+Base = declarative_base(cls=AsyncAttrs)
+
+# updated_at is maintained by a moddatetime trigger instead of an ORM onupdate
+# parameter, so UPDATE statements keep a stable shape and bulk/Core updates
+# cannot skip it
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS moddatetime")
+)
+
+# Case-insensitive text type used for e-mail addresses
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS citext")
+)
+
+# Trigram operator classes back the admin substring searches
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
+
+UPDATED_AT_TRIGGER = DDL(
+    "CREATE TRIGGER set_updated_at BEFORE UPDATE ON %(table)s "
+    "FOR EACH ROW EXECUTE FUNCTION moddatetime(updated_at)"
+)
+
+def updated_at_trigger(table):
+    """Attach the updated_at trigger to a table"""
+    event.listen(table, "after_create", UPDATED_AT_TRIGGER)
+
+# Append-only time-series tables are range partitioned by month. Partitions are
+# created ahead of time by maintain_partitions(), which runs at startup and
+# periodically after that; the default partition only catches rows outside the
+# prepared ranges. Maps table name -> partition key column
+MONTHLY_PARTITIONED_TABLES = {}
+
+DEFAULT_PARTITION = DDL("CREATE TABLE %(table)s_default PARTITION OF %(table)s DEFAULT")
+
+def monthly_partitions(table):
+    """Register a RANGE partitioned table for monthly partition maintenance"""
+    partition_by = table.dialect_options["postgresql"]["partition_by"]
+    MONTHLY_PARTITIONED_TABLES[table.name] = re.fullmatch(r"RANGE \((\w+)\)", partition_by).group(1)
+    event.listen(table, "after_create", DEFAULT_PARTITION)
+
+def _add_months(month: date, months: int) -> date:
+    """Shift the first day of a month by a number of months"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+async def _create_partition(conn, table: str, key: str, start: date, end: date):
+    """Create one monthly partition, moving matching rows out of the default partition"""
+    partition = f"{table}_p{start:%Y%m}"
+    exists = await conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": partition})
+    if exists:
+        return
+    
+    bounds = f"{key} >= '{start}' AND {key} < '{end}'"
+    create = (
+        f"CREATE TABLE {partition} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    stray_rows = await conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {bounds})"))
+    if not stray_rows:
+        await conn.execute(text(create))
+        return
+    
+    # The new range would overlap rows already in the default partition, which
+    # Postgres refuses. Take the default out, create the month, move its rows
+    # over and put the default back, all in the caller's transaction
+    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {table}_default"))
+    await conn.execute(text(create))
+    await conn.execute(text(f"INSERT INTO {partition} SELECT * FROM {table}_default WHERE {bounds}"))
+    await conn.execute(text(f"DELETE FROM {table}_default WHERE {bounds}"))
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {table}_default DEFAULT"))
+    logger.info(f"Moved rows of {partition} out of {table}_default")
+
+async def maintain_partitions(conn, months_ahead: int = None, retention_months: int = None):
+    """Create upcoming monthly partitions and drop the expired ones"""
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    retention_months = settings.PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    
+    # Several application processes may run this at once, one at a time is enough
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('maintain_partitions'))"))
+    
+    current_month = date.today().replace(day=1)
+    cutoff = _add_months(current_month, -retention_months)
+    
+    for table, key in MONTHLY_PARTITIONED_TABLES.items():
+        # Create partitions for this month and the next ones
+        for offset in range(months_ahead + 1):
+            start = _add_months(current_month, offset)
+            await _create_partition(conn, table, key, start, _add_months(start, 1))
+        
+        # Drop whole partitions past the retention window
+        result = await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ), {"table": table})
+        for (partition,) in result.all():
+            suffix = partition[len(table) + 2:]
+            if not partition.startswith(f"{table}_p") or not suffix.isdigit():
+                continue
+            if date(int(suffix[:4]), int(suffix[4:]), 1) < cutoff:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+                logger.info(f"Dropped expired partition {partition}")
+
+class PartitionMaintenance:
+    """Re-runs maintain_partitions periodically while the application is up"""
+    
+    def __init__(self, interval: float = None):
+        self.interval = interval or settings.PARTITION_MAINTENANCE_INTERVAL_HOURS * 3600
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the maintenance loop, called from the application lifespan"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with engine.begin() as conn:
+                    await maintain_partitions(conn)
+            except Exception:
+                logger.exception("Partition maintenance failed")
+
+partition_maintenance = PartitionMaintenance()
 
 # Database dependency
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -48,11 +201,17 @@ async def init_db():
     try:
         async with engine.begin() as conn:
             # Import all models
-            from app.models import user, tenant, billing, odoo_instance, audit_log
+            from app.models import user, tenant, billing, odoo_instance, audit_log, backup
             
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
             
+            # Fill the instance port pool
+            await conn.execute(odoo_instance.INSTANCE_PORTS_SEED)
+            
+            # Prepare monthly partitions
+            await maintain_partitions(conn)
+            
         logger.info("Database initialized successfully")
         
         # Create admin user
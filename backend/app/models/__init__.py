@@ -3,12 +3,13 @@ Models package initialization
 """
 from .user import User
 from .tenant import Tenant, TenantStatus
-from .odoo_instance import OdooInstance, InstanceStatus
+from .odoo_instance import OdooInstance, InstanceStatus, InstancePort
 from .billing import (
     BillingRecord, SubscriptionPlan, Subscription, Payment, Invoice, Usage,
-    SubscriptionStatus, PaymentStatus
+    StripeEvent, SubscriptionStatus, PaymentStatus
 )
 from .audit_log import AuditLog
+from .backup import BackupRecord
 
 __all__ = [
     "User",
@@ -16,14 +17,17 @@ __all__ = [
     "TenantStatus", 
     "OdooInstance",
     "InstanceStatus",
+    "InstancePort",
     "BillingRecord",
     "SubscriptionPlan",
     "Subscription",
     "Payment",
     "Invoice",
     "Usage",
+    "StripeEvent",
     "SubscriptionStatus",
     "PaymentStatus",
-    "AuditLog"
+    "AuditLog",
+    "BackupRecord"
 ]
 
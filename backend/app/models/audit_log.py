@@ -1,32 +1,37 @@
 """
 Audit Log model for tracking system activities
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from app.core.database import Base
+from sqlalchemy.dialects.postgresql import INET
+from app.core.database import Base, monthly_partitions
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
     
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
     # Action information
     action = Column(String(100), nullable=False)
     resource_type = Column(String(50), nullable=False)
     resource_id = Column(String(100), nullable=True)
+    # Numeric copy of resource_id, set on write so readers don't parse strings
+    resource_id_int = Column(BigInteger, nullable=True)
     
     # Details
     description = Column(Text, nullable=True)
-    ip_address = Column(String(45), nullable=True)
+    ip_address = Column(INET, nullable=True)
     user_agent = Column(Text, nullable=True)
     
     # Additional data
     details = Column(JSON, nullable=True)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="audit_logs")
@@ -34,3 +39,6 @@ class AuditLog(Base):
     def __repr__(self):
         return f"<AuditLog(action='{self.action}', resource_type='{self.resource_type}')>"
 
+monthly_partitions(AuditLog.__table__)
+
+Index("ix_audit_logs_resource", AuditLog.resource_type, AuditLog.resource_id_int)
@@ -0,0 +1,43 @@
+"""
+Backup Record model for tracking database and file backups
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class BackupRecord(Base):
+    __tablename__ = "backup_records"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Null for platform wide backups
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True, index=True)
+    
+    # Backup information
+    backup_type = Column(String(20), nullable=False)  # database, files
+    backup_name = Column(String(255), nullable=False)
+    file_path = Column(String(500), nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    
+    # Status
+    status = Column(String(20), nullable=False, default="running")  # running, completed, failed
+    error_message = Column(Text, nullable=True)
+    
+    # Incremental file backups form chains: a level 0 full archive, then
+    # archives that each hold the changes since the previous level. chain_id
+    # points at the level 0 record and is null on that record itself
+    level = Column(Integer, nullable=False, default=0)
+    chain_id = Column(Integer, ForeignKey("backup_records.id"), nullable=True)
+    
+    # S3 storage
+    s3_url = Column(String(500), nullable=True)
+    s3_bucket = Column(String(255), nullable=True)
+    s3_key = Column(String(1024), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<BackupRecord(backup_name='{self.backup_name}', status='{self.status}')>"
+
+# Retention groups records by chain, and chains are extended from their newest member
+Index("ix_backup_records_chain", func.coalesce(BackupRecord.chain_id, BackupRecord.id), BackupRecord.created_at)
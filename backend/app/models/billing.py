@@ -1,11 +1,11 @@
 """
 Billing models for subscription and payment management
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, Numeric, JSON
+from sqlalchemy import Column, Integer, String, CHAR, Boolean, DateTime, Text, ForeignKey, Enum, Numeric, JSON, FetchedValue, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
-from app.core.database import Base
+from app.core.database import Base, updated_at_trigger, monthly_partitions
 
 class SubscriptionStatus(str, enum.Enum):
     ACTIVE = "active"
@@ -27,7 +27,7 @@ class SubscriptionPlan(Base):
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
     price = Column(Numeric(10, 2), nullable=False)
-    currency = Column(String(3), default="USD")
+    currency = Column(CHAR(3), default="USD")
     billing_interval = Column(String(20), default="monthly")  # monthly, yearly
     
     # Limits
@@ -46,7 +46,7 @@ class SubscriptionPlan(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     
     # Relationships
     subscriptions = relationship("Subscription", back_populates="plan")
@@ -54,15 +54,17 @@ class SubscriptionPlan(Base):
     def __repr__(self):
         return f"<SubscriptionPlan(name='{self.name}', price={self.price})>"
 
+updated_at_trigger(SubscriptionPlan.__table__)
+
 class Subscription(Base):
     __tablename__ = "subscriptions"
     
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
-    plan_id = Column(Integer, ForeignKey("subscription_plans.id"), nullable=False)
+    plan_id = Column(Integer, ForeignKey("subscription_plans.id"), nullable=False, index=True)
     
     # Status
-    status = Column(Enum(SubscriptionStatus), default=SubscriptionStatus.TRIALING)
+    status = Column(Enum(SubscriptionStatus, name="subscriptionstatus", native_enum=True), default=SubscriptionStatus.TRIALING)
     
     # Billing period
     current_period_start = Column(DateTime(timezone=True), nullable=False)
@@ -75,7 +77,7 @@ class Subscription(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     
     # Relationships
     tenant = relationship("Tenant", back_populates="subscriptions")
@@ -86,6 +88,28 @@ class Subscription(Base):
     def __repr__(self):
         return f"<Subscription(tenant_id={self.tenant_id}, status='{self.status}')>"
 
+updated_at_trigger(Subscription.__table__)
+
+# Active subscription lookups per tenant, also serves tenant_id lookups on its own
+Index("ix_subscriptions_tenant_status", Subscription.tenant_id, Subscription.status)
+
+# A tenant has at most one live subscription, inserts rely on this to settle races
+Index(
+    "uq_subscriptions_tenant_live",
+    Subscription.tenant_id,
+    unique=True,
+    postgresql_where=Subscription.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING])
+)
+
+# Subscription counts on the billing dashboards only look at these states
+Index(
+    "ix_subscriptions_status_counted",
+    Subscription.status,
+    postgresql_where=Subscription.status.in_([
+        SubscriptionStatus.ACTIVE, SubscriptionStatus.CANCELLED, SubscriptionStatus.TRIALING
+    ])
+)
+
 class Payment(Base):
     __tablename__ = "payments"
     
@@ -94,8 +118,8 @@ class Payment(Base):
     
     # Payment details
     amount = Column(Numeric(10, 2), nullable=False)
-    currency = Column(String(3), default="USD")
-    status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING)
+    currency = Column(CHAR(3), default="USD")
+    status = Column(Enum(PaymentStatus, name="paymentstatus", native_enum=True), default=PaymentStatus.PENDING)
     
     # Stripe integration
     stripe_payment_intent_id = Column(String(255), nullable=True)
@@ -103,7 +127,7 @@ class Payment(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     
     # Relationships
     subscription = relationship("Subscription", back_populates="payments")
@@ -111,16 +135,41 @@ class Payment(Base):
     def __repr__(self):
         return f"<Payment(subscription_id={self.subscription_id}, amount={self.amount}, status='{self.status}')>"
 
+updated_at_trigger(Payment.__table__)
+
+# Also serves subscription_id lookups on its own, so the FK needs no separate index
+Index("ix_payments_sub_status", Payment.subscription_id, Payment.status)
+
+# Payment history of a subscription, newest first
+Index("ix_payments_sub_created_at", Payment.subscription_id, Payment.created_at.desc())
+
+# Revenue sums are always over completed payments bounded by created_at,
+# including amount lets them run as index-only scans
+Index(
+    "ix_payments_completed_created_at",
+    Payment.created_at,
+    postgresql_include=["amount"],
+    postgresql_where=(Payment.status == PaymentStatus.COMPLETED)
+)
+
+# The overdue payments alert counts pending payments older than a cutoff,
+# pending rows are few so the count stays a small range scan
+Index(
+    "ix_payments_pending_created_at",
+    Payment.created_at,
+    postgresql_where=(Payment.status == PaymentStatus.PENDING)
+)
+
 class Invoice(Base):
     __tablename__ = "invoices"
     
     id = Column(Integer, primary_key=True, index=True)
-    subscription_id = Column(Integer, ForeignKey("subscriptions.id"), nullable=False)
+    subscription_id = Column(Integer, ForeignKey("subscriptions.id"), nullable=False, index=True)
     
     # Invoice details
     invoice_number = Column(String(50), unique=True, nullable=False)
     amount = Column(Numeric(10, 2), nullable=False)
-    currency = Column(String(3), default="USD")
+    currency = Column(CHAR(3), default="USD")
     status = Column(String(20), default="draft")  # draft, open, paid, void
     
     # Dates
@@ -132,7 +181,7 @@ class Invoice(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     
     # Relationships
     subscription = relationship("Subscription", back_populates="invoices")
@@ -140,16 +189,20 @@ class Invoice(Base):
     def __repr__(self):
         return f"<Invoice(invoice_number='{self.invoice_number}', amount={self.amount})>"
 
+updated_at_trigger(Invoice.__table__)
+
 class Usage(Base):
     __tablename__ = "usage_records"
+    __table_args__ = {"postgresql_partition_by": "RANGE (recorded_at)"}
     
-    id = Column(Integer, primary_key=True, index=True)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
     
     # Usage details
     metric_name = Column(String(50), nullable=False)  # instances, storage, users, etc.
     value = Column(Integer, nullable=False)
-    recorded_at = Column(DateTime(timezone=True), nullable=False)
+    recorded_at = Column(DateTime(timezone=True), primary_key=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -160,16 +213,21 @@ class Usage(Base):
     def __repr__(self):
         return f"<Usage(tenant_id={self.tenant_id}, metric='{self.metric_name}', value={self.value})>"
 
+monthly_partitions(Usage.__table__)
+
+# Usage series per tenant and metric, also serves tenant_id lookups on its own
+Index("ix_usage_records_tenant_metric_time", Usage.tenant_id, Usage.metric_name, Usage.recorded_at)
+
 # Legacy billing record for backward compatibility
 class BillingRecord(Base):
     __tablename__ = "billing_records"
     
     id = Column(Integer, primary_key=True, index=True)
-    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
     
     # Billing information
     amount = Column(Numeric(10, 2), nullable=False)
-    currency = Column(String(3), default="USD")
+    currency = Column(CHAR(3), default="USD")
     status = Column(String(20), default="pending")
     
     # Stripe information
@@ -191,7 +249,7 @@ class BillingRecord(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     paid_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
@@ -200,3 +258,15 @@ class BillingRecord(Base):
     def __repr__(self):
         return f"<BillingRecord(tenant_id={self.tenant_id}, amount={self.amount}, status='{self.status}')>"
 
+updated_at_trigger(BillingRecord.__table__)
+
+class StripeEvent(Base):
+    """Stripe webhook events already handled, Stripe retries deliveries"""
+    __tablename__ = "stripe_events"
+    
+    id = Column(String(255), primary_key=True)
+    event_type = Column(String(100), nullable=False)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<StripeEvent(id='{self.id}', event_type='{self.event_type}')>"
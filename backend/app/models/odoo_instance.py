@@ -1,11 +1,13 @@
 """
 Odoo Instance model for managing Odoo containers
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, JSON, FetchedValue, Index, Computed, false, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.ext.hybrid import hybrid_property
 import enum
-from app.core.database import Base
+from app.core.database import Base, updated_at_trigger
+from app.core.config import settings
 
 class InstanceStatus(str, enum.Enum):
     CREATING = "creating"
@@ -19,7 +21,7 @@ class OdooInstance(Base):
     __tablename__ = "odoo_instances"
     
     id = Column(Integer, primary_key=True, index=True)
-    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
     
     # Container information
     container_id = Column(String(255), nullable=True)
@@ -28,12 +30,13 @@ class OdooInstance(Base):
     # Configuration
     odoo_version = Column(String(20), default="17.0")
     port = Column(Integer, nullable=False)
+    # Stored generated column, composed once on write instead of on every read
+    url = Column(String(255), Computed("'http://host.odoo-egypt.com:' || port::text", persisted=True))
     database_name = Column(String(100), nullable=False)
     admin_password = Column(String(255), nullable=False)
     
     # Status
-    status = Column(Enum(InstanceStatus), default=InstanceStatus.CREATING)
-    is_active = Column(Boolean, default=True)
+    status = Column(Enum(InstanceStatus, name="instancestatus", native_enum=True), default=InstanceStatus.CREATING)
     
     # Resource usage
     cpu_limit = Column(String(10), default="1.0")
@@ -50,7 +53,7 @@ class OdooInstance(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     started_at = Column(DateTime(timezone=True), nullable=True)
     stopped_at = Column(DateTime(timezone=True), nullable=True)
     
@@ -60,13 +63,61 @@ class OdooInstance(Base):
     def __repr__(self):
         return f"<OdooInstance(container_name='{self.container_name}', status='{self.status}')>"
     
-    @property
-    def url(self):
-        """Get Odoo instance URL"""
-        return f"http://host.odoo-egypt.com:{self.port}"
-    
     @property
     def is_running(self):
         """Check if instance is running"""
         return self.status == InstanceStatus.RUNNING
+    
+    @hybrid_property
+    def is_active(self):
+        """Instances are active until they are being deleted"""
+        return self.status != InstanceStatus.DELETING
+
+updated_at_trigger(OdooInstance.__table__)
+
+# Running instances are looked up per tenant on every dashboard load, keep a
+# small partial index just for them
+Index(
+    "ix_odoo_instances_running",
+    OdooInstance.tenant_id,
+    postgresql_where=(OdooInstance.status == InstanceStatus.RUNNING)
+)
+
+# The failed instances alert counts instances in error state, normally none,
+# so the count reads an empty or tiny index
+Index(
+    "ix_odoo_instances_error",
+    OdooInstance.id,
+    postgresql_where=(OdooInstance.status == InstanceStatus.ERROR)
+)
+
+# Creation trends on the performance dashboard are bounded by created_at
+Index("ix_odoo_instances_created_at", OdooInstance.created_at)
+
+class InstancePort(Base):
+    """Pool of host ports handed out to Odoo instances"""
+    __tablename__ = "instance_ports"
+    
+    port = Column(Integer, primary_key=True, autoincrement=False)
+    used = Column(Boolean, nullable=False, default=False, server_default=false())
+    
+    def __repr__(self):
+        return f"<InstancePort(port={self.port}, used={self.used})>"
+
+# Fills the pool, run by init_db once all tables exist. Allocation starts right
+# after the default Odoo port, longpolling takes port + 1000 so the range must
+# stay below that offset. Ports already bound by existing instances start out
+# used, and ports already in the pool are left as they are
+INSTANCE_PORTS_SEED = text(
+    "INSERT INTO instance_ports (port, used) "
+    "SELECT gs, EXISTS (SELECT 1 FROM odoo_instances WHERE odoo_instances.port = gs) "
+    f"FROM generate_series({settings.ODOO_BASE_PORT + 1}, {settings.ODOO_BASE_PORT + settings.ODOO_PORT_RANGE}) AS gs "
+    "ON CONFLICT (port) DO NOTHING"
+)
 
+# Free ports are claimed lowest first, index just those
+Index(
+    "ix_instance_ports_free",
+    InstancePort.port,
+    postgresql_where=(InstancePort.used == false())
+)
@@ -1,11 +1,12 @@
 """
 Tenant model for multi-tenant architecture
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Numeric, FetchedValue, Index, Computed
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.ext.hybrid import hybrid_property
 import enum
-from app.core.database import Base
+from app.core.database import Base, updated_at_trigger
 
 class TenantStatus(str, enum.Enum):
     PENDING = "pending"
@@ -20,12 +21,17 @@ class Tenant(Base):
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     
+    # Searchable text for the admin listings, trigram indexed and never loaded by default
+    search_text = deferred(Column(Text, Computed(
+        "name || ' ' || coalesce(description, '')",
+        persisted=True
+    )))
+    
     # Owner information
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Status and configuration
-    status = Column(Enum(TenantStatus), default=TenantStatus.ACTIVE)
-    is_active = Column(Boolean, default=True)
+    status = Column(Enum(TenantStatus, name="tenantstatus", native_enum=True), default=TenantStatus.ACTIVE)
     
     # Resource limits
     max_instances = Column(Integer, default=1)
@@ -33,12 +39,15 @@ class Tenant(Base):
     storage_limit_gb = Column(Integer, default=10)
     storage_used_gb = Column(Numeric(10, 2), default=0)
     
+    # Stripe customer, created on the first paid subscription and reused afterwards
+    stripe_customer_id = Column(String(255), nullable=True, unique=True)
+    
     # Activity tracking
     last_activity = Column(DateTime(timezone=True), nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     
     # Relationships
     owner = relationship("User", back_populates="tenants")
@@ -48,4 +57,13 @@ class Tenant(Base):
     
     def __repr__(self):
         return f"<Tenant(name='{self.name}', owner_id={self.owner_id})>"
+    
+    @hybrid_property
+    def is_active(self):
+        """Liveness is derived from status rather than stored separately"""
+        return self.status == TenantStatus.ACTIVE
+
+updated_at_trigger(Tenant.__table__)
 
+Index("ix_tenants_active", Tenant.id, postgresql_where=(Tenant.status == TenantStatus.ACTIVE))
+Index("ix_tenants_search_trgm", Tenant.search_text, postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"})
@@ -1,16 +1,17 @@
 """
 User model for authentication and user management
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, FetchedValue, Computed, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from app.core.database import Base
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import CITEXT
+from app.core.database import Base, updated_at_trigger
 
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String(255), unique=True, index=True, nullable=False)
+    email = Column(CITEXT, unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(255), nullable=True)
     is_active = Column(Boolean, default=True)
@@ -22,17 +23,23 @@ class User(Base):
     phone = Column(String(50), nullable=True)
     address = Column(Text, nullable=True)
     
-    # Email verification
-    verification_token = Column(String(255), nullable=True)
+    # Searchable text for the admin listings, trigram indexed and never loaded by default
+    search_text = deferred(Column(Text, Computed(
+        "coalesce(email::text, '') || ' ' || coalesce(full_name, '') || ' ' || coalesce(company, '')",
+        persisted=True
+    )))
+    
+    # Email verification, tokens are stored as SHA-256 hex digests
+    verification_token = Column(String(64), unique=True, nullable=True)
     verification_token_expires = Column(DateTime(timezone=True), nullable=True)
     
     # Password reset
-    reset_token = Column(String(255), nullable=True)
+    reset_token = Column(String(64), unique=True, nullable=True)
     reset_token_expires = Column(DateTime(timezone=True), nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), server_onupdate=FetchedValue())
     last_login = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
@@ -42,3 +49,6 @@ class User(Base):
     def __repr__(self):
         return f"<User(email='{self.email}', full_name='{self.full_name}')>"
 
+updated_at_trigger(User.__table__)
+
+Index("ix_users_search_trgm", User.search_text, postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"})
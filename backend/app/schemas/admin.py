@@ -1,10 +1,10 @@
 """
 Admin schemas for request/response validation
 """
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
-from decimal import Decimal
+from app.schemas.billing import Money
 
 class AdminStatsResponse(BaseModel):
     total_users: int
@@ -13,8 +13,8 @@ class AdminStatsResponse(BaseModel):
     active_tenants: int
     total_instances: int
     running_instances: int
-    total_revenue: Decimal
-    monthly_revenue: Decimal
+    total_revenue: Money
+    monthly_revenue: Money
     storage_used_gb: float
     cpu_usage_percent: float
     memory_usage_percent: float
@@ -43,8 +43,7 @@ class UserManagementResponse(BaseModel):
     last_login: Optional[datetime]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UserUpdateRequest(BaseModel):
     is_active: Optional[bool] = None
@@ -58,13 +57,12 @@ class TenantManagementResponse(BaseModel):
     status: str
     instance_count: int
     subscription_status: Optional[str]
-    monthly_cost: Decimal
+    monthly_cost: Money
     storage_used_gb: float
     created_at: datetime
     last_activity: Optional[datetime]
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class TenantUpdateRequest(BaseModel):
     status: Optional[str] = None
@@ -85,21 +83,20 @@ class InstanceManagementResponse(BaseModel):
     last_backup: Optional[datetime]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class InstanceActionRequest(BaseModel):
-    action: str = Field(..., pattern="^(start|stop|restart|backup|delete)$")
+    action: Literal["start", "stop", "restart", "backup", "delete"]
     force: bool = False
 
 class BillingOverviewResponse(BaseModel):
-    total_revenue: Decimal
-    monthly_revenue: Decimal
-    yearly_revenue: Decimal
+    total_revenue: Money
+    monthly_revenue: Money
+    yearly_revenue: Money
     active_subscriptions: int
     cancelled_subscriptions: int
     trial_subscriptions: int
-    average_revenue_per_user: Decimal
+    average_revenue_per_user: Money
     churn_rate: float
     top_plans: List[Dict[str, Any]]
 
@@ -114,8 +111,7 @@ class AuditLogResponse(BaseModel):
     user_agent: Optional[str]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class AuditLogFilter(BaseModel):
     user_id: Optional[int] = None
@@ -145,8 +141,7 @@ class BackupManagementResponse(BaseModel):
     status: str
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class MaintenanceScheduleResponse(BaseModel):
     id: int
@@ -158,8 +153,7 @@ class MaintenanceScheduleResponse(BaseModel):
     affected_services: List[str]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class MaintenanceScheduleCreate(BaseModel):
     title: str = Field(..., min_length=1, max_length=200)
@@ -168,3 +162,7 @@ class MaintenanceScheduleCreate(BaseModel):
     scheduled_end: datetime
     affected_services: List[str] = []
 
+# List adapters are built once at import time, so list endpoints validate a
+# whole page in a single call
+UserManagementList = TypeAdapter(List[UserManagementResponse])
+InstanceManagementList = TypeAdapter(List[InstanceManagementResponse])
@@ -1,24 +1,15 @@
 """
 Billing schemas for request/response validation
 """
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, PlainSerializer
+from typing import Optional, List, Annotated
 from datetime import datetime
 from decimal import Decimal
-from enum import Enum
 
-class SubscriptionStatus(str, Enum):
-    ACTIVE = "active"
-    INACTIVE = "inactive"
-    CANCELLED = "cancelled"
-    PAST_DUE = "past_due"
-    TRIALING = "trialing"
+from app.models.billing import SubscriptionStatus, PaymentStatus
 
-class PaymentStatus(str, Enum):
-    PENDING = "pending"
-    COMPLETED = "completed"
-    FAILED = "failed"
-    REFUNDED = "refunded"
+# Decimal amounts are serialized as strings so they keep their precision in JSON
+Money = Annotated[Decimal, PlainSerializer(lambda d: str(d), return_type=str, when_used="json")]
 
 class SubscriptionPlanCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
@@ -35,7 +26,7 @@ class SubscriptionPlanResponse(BaseModel):
     id: int
     name: str
     description: Optional[str]
-    price: Decimal
+    price: Money
     currency: str
     billing_interval: str
     max_instances: int
@@ -45,8 +36,14 @@ class SubscriptionPlanResponse(BaseModel):
     is_active: bool
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class SubscriptionPlanSnapshot(SubscriptionPlanResponse):
+    """Read-only copy of a plan, detached from any session so it can be cached"""
+    features: Optional[List[str]] = None
+    stripe_price_id: Optional[str] = None
+    
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 class SubscriptionCreate(BaseModel):
     tenant_id: int
@@ -68,32 +65,32 @@ class SubscriptionResponse(BaseModel):
     # Related objects
     plan: SubscriptionPlanResponse
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class PaymentCreate(BaseModel):
     subscription_id: int
     amount: Decimal = Field(..., gt=0)
     currency: str = Field(default="USD", max_length=3)
     payment_method_id: str
+    # Client generated id of this charge, retries sending the same id are charged once
+    request_id: Optional[str] = Field(default=None, max_length=200)
 
 class PaymentResponse(BaseModel):
     id: int
     subscription_id: int
-    amount: Decimal
+    amount: Money
     currency: str
     status: PaymentStatus
     stripe_payment_intent_id: Optional[str]
     failure_reason: Optional[str]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class InvoiceResponse(BaseModel):
     id: int
     subscription_id: int
-    amount: Decimal
+    amount: Money
     currency: str
     status: str
     invoice_number: str
@@ -102,8 +99,7 @@ class InvoiceResponse(BaseModel):
     stripe_invoice_id: Optional[str]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UsageResponse(BaseModel):
     id: int
@@ -112,14 +108,13 @@ class UsageResponse(BaseModel):
     value: int
     recorded_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class BillingStatsResponse(BaseModel):
-    total_revenue: Decimal
-    monthly_revenue: Decimal
+    total_revenue: Money
+    monthly_revenue: Money
     active_subscriptions: int
     total_customers: int
     churn_rate: float
-    average_revenue_per_user: Decimal
+    average_revenue_per_user: Money
 
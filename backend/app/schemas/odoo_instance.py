@@ -1,30 +1,25 @@
 """
 Odoo Instance schemas for request/response validation
 """
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl, StringConstraints, EmailStr
+from typing import Optional, Dict, Any, List, Annotated
 from datetime import datetime
 from enum import Enum
 
-class InstanceStatus(str, Enum):
-    CREATING = "creating"
-    RUNNING = "running"
-    STOPPED = "stopped"
-    UPDATING = "updating"
-    DELETING = "deleting"
-    ERROR = "error"
+from app.models.odoo_instance import InstanceStatus
 
 class InstanceType(str, Enum):
     COMMUNITY = "community"
     ENTERPRISE = "enterprise"
 
+# Identifiers are stripped by pydantic-core; passwords are left untouched
 class OdooInstanceCreate(BaseModel):
-    name: str = Field(..., min_length=1, max_length=100)
+    name: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=100)]
     description: Optional[str] = None
-    odoo_version: str = Field(default="17.0")
+    odoo_version: Annotated[str, StringConstraints(strip_whitespace=True)] = "17.0"
     instance_type: InstanceType = InstanceType.COMMUNITY
-    database_name: str = Field(..., min_length=1, max_length=50)
-    admin_email: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
+    database_name: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=50)]
+    admin_email: EmailStr
     admin_password: str = Field(..., min_length=8)
     modules: Optional[List[str]] = []
     custom_domain: Optional[str] = None
@@ -58,8 +53,7 @@ class OdooInstanceResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime]
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class InstanceStatsResponse(BaseModel):
     cpu_usage: float
@@ -85,8 +79,7 @@ class InstanceBackupResponse(BaseModel):
     status: str
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class InstanceRestoreRequest(BaseModel):
     backup_id: int
@@ -1,18 +1,22 @@
 """
 Tenant schemas for request/response validation
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
 
 class TenantCreate(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+    
     name: str = Field(..., min_length=1, max_length=255)
     description: Optional[str] = None
     max_instances: Optional[int] = Field(default=1, ge=1)
     storage_limit_gb: Optional[int] = Field(default=10, ge=1)
 
 class TenantUpdate(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+    
     name: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = None
     max_instances: Optional[int] = Field(None, ge=1)
@@ -33,8 +37,9 @@ class TenantResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime]
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+TenantList = TypeAdapter(List[TenantResponse])
 
 class TenantStats(BaseModel):
     total_instances: int
@@ -3,6 +3,7 @@ Admin service for system administration
 """
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from app.core.database import AsyncSessionLocal
 from app.core.security import get_password_hash
 from app.core.config import settings
@@ -15,25 +16,31 @@ async def create_admin_user():
     """Create default admin user if not exists"""
     async with AsyncSessionLocal() as db:
         try:
-            # Check if admin user exists
-            result = await db.execute(select(User).where(User.email == settings.ADMIN_EMAIL))
-            admin_user = result.scalar_one_or_none()
+            # Check if admin user exists, without loading the row
+            result = await db.execute(
+                select(User.id).where(User.email == settings.ADMIN_EMAIL).limit(1)
+            )
             
-            if not admin_user:
-                # Create admin user
-                admin_user = User(
-                    email=settings.ADMIN_EMAIL,
-                    hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
-                    full_name="System Administrator",
-                    is_active=True,
-                    is_admin=True,
-                    is_verified=True
+            if result.first() is None:
+                # Create admin user; another worker may be doing the same at startup
+                result = await db.execute(
+                    insert(User)
+                    .values(
+                        email=settings.ADMIN_EMAIL,
+                        hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
+                        full_name="System Administrator",
+                        is_active=True,
+                        is_admin=True,
+                        is_verified=True
+                    )
+                    .on_conflict_do_nothing(index_elements=[User.email])
                 )
-                
-                db.add(admin_user)
                 await db.commit()
                 
-                logger.info(f"Admin user created: {settings.ADMIN_EMAIL}")
+                if result.rowcount:
+                    logger.info(f"Admin user created: {settings.ADMIN_EMAIL}")
+                else:
+                    logger.info("Admin user already exists")
             else:
                 logger.info("Admin user already exists")
                 
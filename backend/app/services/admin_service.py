@@ -1,76 +1,104 @@
 """
 Comprehensive admin service for platform management
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func, text
+from sqlalchemy import select, update, delete, func, text, lambda_stmt, distinct
 from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
+from cachetools import TTLCache, cached
 from decimal import Decimal
 
 from app.models.user import User
 from app.models.tenant import Tenant
-from app.models.odoo_instance import OdooInstance
-from app.models.billing import Subscription, Payment, SubscriptionPlan
+from app.models.odoo_instance import OdooInstance, InstanceStatus
+from app.models.billing import Subscription, Payment, SubscriptionPlan, SubscriptionStatus, PaymentStatus
 from app.models.audit_log import AuditLog
 from app.core.security import get_password_hash
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.cache import cache_get, cache_set
 from app.schemas.admin import (
     AdminStatsResponse, SystemHealthResponse, UserManagementResponse,
     TenantManagementResponse, InstanceManagementResponse, BillingOverviewResponse,
-    AuditLogResponse, AuditLogFilter
+    AuditLogResponse, AuditLogFilter, UserManagementList, InstanceManagementList
 )
 
+# Default look-back window for audit log listings without a start date
+AUDIT_LOG_DEFAULT_DAYS = 30
+AUDIT_LOG_BATCH_SIZE = 500
+
+# Dashboard aggregates change slowly, they are cached for ADMIN_STATS_CACHE_TTL seconds
+ADMIN_STATS_CACHE_KEY = "admin:stats"
+BILLING_OVERVIEW_CACHE_KEY = "admin:billing_overview"
+
+_ZERO = Decimal('0')
+
+@cached(TTLCache(maxsize=1, ttl=60))
+def period_starts() -> Tuple[datetime, datetime]:
+    """Start of the current month and year, recomputed at most once a minute"""
+    start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return start_of_month, start_of_month.replace(month=1)
+
 class AdminService:
     """Service for admin operations and platform management"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
     
+    async def _one(self, stmt):
+        """Run an aggregate query on its own session so several can run concurrently"""
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(stmt)).one()
+    
+    async def _all(self, stmt):
+        """Run a multi-row query on its own session so several can run concurrently"""
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(stmt)).all()
+    
     async def get_admin_stats(self) -> AdminStatsResponse:
-        """Get comprehensive admin statistics"""
-        # User statistics
-        total_users_result = await self.db.execute(select(func.count(User.id)))
-        total_users = total_users_result.scalar() or 0
-        
-        active_users_result = await self.db.execute(
-            select(func.count(User.id)).where(User.is_active == True)
-        )
-        active_users = active_users_result.scalar() or 0
-        
-        # Tenant statistics
-        total_tenants_result = await self.db.execute(select(func.count(Tenant.id)))
-        total_tenants = total_tenants_result.scalar() or 0
-        
-        active_tenants_result = await self.db.execute(
-            select(func.count(Tenant.id)).where(Tenant.is_active == True)
-        )
-        active_tenants = active_tenants_result.scalar() or 0
-        
-        # Instance statistics
-        total_instances_result = await self.db.execute(select(func.count(OdooInstance.id)))
-        total_instances = total_instances_result.scalar() or 0
-        
-        running_instances_result = await self.db.execute(
-            select(func.count(OdooInstance.id)).where(OdooInstance.status == 'running')
-        )
-        running_instances = running_instances_result.scalar() or 0
-        
-        # Revenue statistics
-        total_revenue_result = await self.db.execute(
-            select(func.sum(Payment.amount)).where(Payment.status == 'completed')
-        )
-        total_revenue = total_revenue_result.scalar() or Decimal('0')
-        
-        # Monthly revenue
-        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_revenue_result = await self.db.execute(
-            select(func.sum(Payment.amount)).where(
-                Payment.status == 'completed',
-                Payment.created_at >= start_of_month
-            )
+        """Get comprehensive admin statistics, served from a short-lived cache"""
+        hit = await cache_get(ADMIN_STATS_CACHE_KEY)
+        if hit:
+            return AdminStatsResponse.model_validate_json(hit)
+        
+        stats = await self._compute_admin_stats()
+        await cache_set(ADMIN_STATS_CACHE_KEY, stats.model_dump_json(), settings.ADMIN_STATS_CACHE_TTL)
+        return stats
+    
+    async def _compute_admin_stats(self) -> AdminStatsResponse:
+        """Aggregate admin statistics from the database"""
+        start_of_month, _ = period_starts()
+        completed = Payment.status == PaymentStatus.COMPLETED
+        
+        # One conditional aggregate per table, the tables are queried concurrently
+        users, tenants, instances, revenue = await asyncio.gather(
+            # User statistics
+            self._one(select(
+                func.count(),
+                func.count().filter(User.is_active == True)
+            ).select_from(User.__table__)),
+            # Tenant statistics
+            self._one(select(
+                func.count(),
+                func.count().filter(Tenant.is_active)
+            ).select_from(Tenant.__table__)),
+            # Instance statistics
+            self._one(select(
+                func.count(),
+                func.count().filter(OdooInstance.status == InstanceStatus.RUNNING)
+            ).select_from(OdooInstance.__table__)),
+            # Revenue statistics
+            self._one(select(
+                func.coalesce(func.sum(Payment.amount).filter(completed), 0),
+                func.coalesce(func.sum(Payment.amount).filter(completed, Payment.created_at >= start_of_month), 0)
+            ))
         )
-        monthly_revenue = monthly_revenue_result.scalar() or Decimal('0')
+        total_users, active_users = users
+        total_tenants, active_tenants = tenants
+        total_instances, running_instances = instances
+        total_revenue, monthly_revenue = revenue
         
         # Storage and resource usage (placeholder values)
         storage_used_gb = 0.0
@@ -127,15 +155,21 @@ class AdminService:
         is_admin: Optional[bool] = None
     ) -> List[UserManagementResponse]:
         """Get users for admin management"""
-        query = select(User)
+        # Tenant and instance counts are aggregated in the same query
+        query = (
+            select(
+                User,
+                func.count(distinct(Tenant.id)).label('tenant_count'),
+                func.count(distinct(OdooInstance.id)).label('instance_count')
+            )
+            .outerjoin(Tenant, Tenant.owner_id == User.id)
+            .outerjoin(OdooInstance, OdooInstance.tenant_id == Tenant.id)
+            .group_by(User.id)
+        )
         
         # Apply filters
         if search:
-            query = query.where(
-                User.email.ilike(f"%{search}%") |
-                User.full_name.ilike(f"%{search}%") |
-                User.company.ilike(f"%{search}%")
-            )
+            query = query.where(User.search_text.ilike(f"%{search}%"))
         
         if is_active is not None:
             query = query.where(User.is_active == is_active)
@@ -146,26 +180,11 @@ class AdminService:
         query = query.offset(skip).limit(limit).order_by(User.created_at.desc())
         
         result = await self.db.execute(query)
-        users = result.scalars().all()
         
         # Convert to management response format
         users_list = []
-        for user in users:
-            # Get tenant count
-            tenant_count_result = await self.db.execute(
-                select(func.count(Tenant.id)).where(Tenant.owner_id == user.id)
-            )
-            tenant_count = tenant_count_result.scalar() or 0
-            
-            # Get instance count
-            instance_count_result = await self.db.execute(
-                select(func.count(OdooInstance.id))
-                .join(Tenant)
-                .where(Tenant.owner_id == user.id)
-            )
-            instance_count = instance_count_result.scalar() or 0
-            
-            users_list.append(UserManagementResponse(
+        for user, tenant_count, instance_count in result.all():
+            users_list.append(dict(
                 id=user.id,
                 email=user.email,
                 full_name=user.full_name,
@@ -179,7 +198,7 @@ class AdminService:
                 created_at=user.created_at
             ))
         
-        return users_list
+        return UserManagementList.validate_python(users_list)
     
     async def get_tenants_management(
         self, 
@@ -189,50 +208,44 @@ class AdminService:
         status: Optional[str] = None
     ) -> List[TenantManagementResponse]:
         """Get tenants for admin management"""
-        query = select(Tenant).options(selectinload(Tenant.owner))
+        query = lambda_stmt(
+            lambda: select(Tenant, func.count(OdooInstance.id).label('instance_count'))
+            .outerjoin(OdooInstance, OdooInstance.tenant_id == Tenant.id)
+            .group_by(Tenant.id)
+            .options(
+                selectinload(Tenant.owner),
+                selectinload(Tenant.subscriptions).selectinload(Subscription.plan)
+            )
+        )
         
         # Apply filters
         if search:
-            query = query.where(
-                Tenant.name.ilike(f"%{search}%") |
-                Tenant.description.ilike(f"%{search}%")
-            )
+            pattern = f"%{search}%"
+            query += lambda q: q.where(Tenant.search_text.ilike(pattern))
         
         if status:
-            query = query.where(Tenant.status == status)
+            query += lambda q: q.where(Tenant.status == status)
         
-        query = query.offset(skip).limit(limit).order_by(Tenant.created_at.desc())
+        query += lambda q: q.offset(skip).limit(limit).order_by(Tenant.created_at.desc())
         
         result = await self.db.execute(query)
-        tenants = result.scalars().all()
         
         # Convert to management response format
         tenants_list = []
-        for tenant in tenants:
-            # Get instance count
-            instance_count_result = await self.db.execute(
-                select(func.count(OdooInstance.id)).where(OdooInstance.tenant_id == tenant.id)
-            )
-            instance_count = instance_count_result.scalar() or 0
-            
-            # Get subscription info
-            subscription_result = await self.db.execute(
-                select(Subscription)
-                .options(selectinload(Subscription.plan))
-                .where(Subscription.tenant_id == tenant.id)
-                .order_by(Subscription.created_at.desc())
-            )
-            subscription = subscription_result.scalar_one_or_none()
+        for tenant, instance_count in result.all():
+            # Latest subscription, from the batch-loaded collection
+            subscription = max(tenant.subscriptions, key=lambda sub: sub.created_at, default=None)
             
-            tenants_list.append(TenantManagementResponse(
+            # Rows come straight from the database, skip re-validation
+            tenants_list.append(TenantManagementResponse.model_construct(
                 id=tenant.id,
                 name=tenant.name,
                 owner_email=tenant.owner.email,
                 status=tenant.status,
                 instance_count=instance_count,
                 subscription_status=subscription.status if subscription else None,
-                monthly_cost=subscription.plan.price if subscription and subscription.plan else Decimal('0'),
-                storage_used_gb=tenant.storage_used_gb or Decimal('0'),
+                monthly_cost=subscription.plan.price if subscription and subscription.plan else _ZERO,
+                storage_used_gb=float(tenant.storage_used_gb or 0),
                 created_at=tenant.created_at,
                 last_activity=tenant.last_activity
             ))
@@ -247,7 +260,11 @@ class AdminService:
         status: Optional[str] = None
     ) -> List[InstanceManagementResponse]:
         """Get instances for admin management"""
-        query = select(OdooInstance).options(selectinload(OdooInstance.tenant))
+        # Uptime is computed by the database alongside each row
+        uptime_hours = func.coalesce(
+            func.floor(func.extract('epoch', func.now() - OdooInstance.started_at) / 3600), 0
+        ).label('uptime_hours')
+        query = select(OdooInstance, uptime_hours).options(selectinload(OdooInstance.tenant))
         
         # Apply filters
         if search:
@@ -262,18 +279,11 @@ class AdminService:
         query = query.offset(skip).limit(limit).order_by(OdooInstance.created_at.desc())
         
         result = await self.db.execute(query)
-        instances = result.scalars().all()
         
         # Convert to management response format
         instances_list = []
-        for instance in instances:
-            # Calculate uptime
-            uptime_hours = 0
-            if instance.started_at:
-                uptime_delta = datetime.utcnow() - instance.started_at
-                uptime_hours = int(uptime_delta.total_seconds() / 3600)
-            
-            instances_list.append(InstanceManagementResponse(
+        for instance, uptime_hours in result.all():
+            instances_list.append(dict(
                 id=instance.id,
                 tenant_name=instance.tenant.name,
                 name=instance.container_name,
@@ -283,60 +293,53 @@ class AdminService:
                 cpu_usage=0.0,  # Placeholder
                 memory_usage=0.0,  # Placeholder
                 storage_used_gb=instance.storage_used_mb / 1024 if instance.storage_used_mb else 0.0,
-                uptime_hours=uptime_hours,
+                uptime_hours=int(uptime_hours),
                 last_backup=instance.last_backup_at,
                 created_at=instance.created_at
             ))
         
-        return instances_list
+        return InstanceManagementList.validate_python(instances_list)
     
     async def get_billing_overview(self) -> BillingOverviewResponse:
-        """Get billing overview for admin"""
-        # Total revenue
-        total_revenue_result = await self.db.execute(
-            select(func.sum(Payment.amount)).where(Payment.status == 'completed')
-        )
-        total_revenue = total_revenue_result.scalar() or Decimal('0')
-        
-        # Monthly revenue
-        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_revenue_result = await self.db.execute(
-            select(func.sum(Payment.amount)).where(
-                Payment.status == 'completed',
-                Payment.created_at >= start_of_month
-            )
-        )
-        monthly_revenue = monthly_revenue_result.scalar() or Decimal('0')
-        
-        # Yearly revenue
-        start_of_year = datetime.utcnow().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        yearly_revenue_result = await self.db.execute(
-            select(func.sum(Payment.amount)).where(
-                Payment.status == 'completed',
-                Payment.created_at >= start_of_year
+        """Get billing overview for admin, served from a short-lived cache"""
+        hit = await cache_get(BILLING_OVERVIEW_CACHE_KEY)
+        if hit:
+            return BillingOverviewResponse.model_validate_json(hit)
+        
+        overview = await self._compute_billing_overview()
+        await cache_set(BILLING_OVERVIEW_CACHE_KEY, overview.model_dump_json(), settings.ADMIN_STATS_CACHE_TTL)
+        return overview
+    
+    async def _compute_billing_overview(self) -> BillingOverviewResponse:
+        """Aggregate the billing overview from the database"""
+        start_of_month, start_of_year = period_starts()
+        completed = Payment.status == PaymentStatus.COMPLETED
+        counted_statuses = [SubscriptionStatus.ACTIVE, SubscriptionStatus.CANCELLED, SubscriptionStatus.TRIALING]
+        
+        revenue, subscriptions = await asyncio.gather(
+            # Total, monthly and yearly revenue
+            self._one(select(
+                func.coalesce(func.sum(Payment.amount).filter(completed), 0),
+                func.coalesce(func.sum(Payment.amount).filter(completed, Payment.created_at >= start_of_month), 0),
+                func.coalesce(func.sum(Payment.amount).filter(completed, Payment.created_at >= start_of_year), 0)
+            )),
+            # Subscription statistics, one row per status
+            self._all(
+                select(Subscription.status, func.count())
+                .where(Subscription.status.in_(counted_statuses))
+                .group_by(Subscription.status)
             )
         )
-        yearly_revenue = yearly_revenue_result.scalar() or Decimal('0')
-        
-        # Subscription statistics
-        active_subs_result = await self.db.execute(
-            select(func.count(Subscription.id)).where(Subscription.status == 'active')
-        )
-        active_subscriptions = active_subs_result.scalar() or 0
-        
-        cancelled_subs_result = await self.db.execute(
-            select(func.count(Subscription.id)).where(Subscription.status == 'cancelled')
-        )
-        cancelled_subscriptions = cancelled_subs_result.scalar() or 0
+        total_revenue, monthly_revenue, yearly_revenue = revenue
         
-        trial_subs_result = await self.db.execute(
-            select(func.count(Subscription.id)).where(Subscription.status == 'trialing')
-        )
-        trial_subscriptions = trial_subs_result.scalar() or 0
+        status_counts = dict(subscriptions)
+        active_subscriptions = status_counts.get(SubscriptionStatus.ACTIVE, 0)
+        cancelled_subscriptions = status_counts.get(SubscriptionStatus.CANCELLED, 0)
+        trial_subscriptions = status_counts.get(SubscriptionStatus.TRIALING, 0)
         
         # Calculate ARPU and churn rate
         total_customers = active_subscriptions + cancelled_subscriptions + trial_subscriptions
-        arpu = total_revenue / total_customers if total_customers > 0 else Decimal('0')
+        arpu = total_revenue / total_customers if total_customers > 0 else _ZERO
         churn_rate = cancelled_subscriptions / total_customers if total_customers > 0 else 0.0
         
         # Top plans (placeholder)
@@ -370,56 +373,59 @@ class AdminService:
             action=action,
             resource_type=resource_type,
             resource_id=str(resource_id) if resource_id else None,
+            resource_id_int=resource_id if isinstance(resource_id, int) else None,
             details=details or {},
             ip_address=ip_address,
             user_agent=user_agent
         )
         
+        # id and created_at come back through INSERT ... RETURNING and sessions
+        # don't expire on commit, so no refresh SELECT is needed
         self.db.add(audit_log)
         await self.db.commit()
-        await self.db.refresh(audit_log)
         
         return audit_log
     
-    async def get_audit_logs(self, filters: AuditLogFilter) -> List[AuditLogResponse]:
-        """Get audit logs with filtering"""
-        query = select(AuditLog).options(selectinload(AuditLog.user))
+    async def get_audit_logs(self, filters: AuditLogFilter) -> AsyncIterator[AuditLogResponse]:
+        """Stream audit logs with filtering"""
+        query = lambda_stmt(lambda: select(AuditLog).options(selectinload(AuditLog.user)))
         
         # Apply filters
         if filters.user_id:
-            query = query.where(AuditLog.user_id == filters.user_id)
+            user_id = filters.user_id
+            query += lambda q: q.where(AuditLog.user_id == user_id)
         
         if filters.action:
-            query = query.where(AuditLog.action.ilike(f"%{filters.action}%"))
+            pattern = f"%{filters.action}%"
+            query += lambda q: q.where(AuditLog.action.ilike(pattern))
         
         if filters.resource_type:
-            query = query.where(AuditLog.resource_type == filters.resource_type)
+            resource_type = filters.resource_type
+            query += lambda q: q.where(AuditLog.resource_type == resource_type)
         
-        if filters.start_date:
-            query = query.where(AuditLog.created_at >= filters.start_date)
+        # Always bound created_at so only the matching monthly partitions are scanned
+        start_date = filters.start_date or datetime.utcnow() - timedelta(days=AUDIT_LOG_DEFAULT_DAYS)
+        query += lambda q: q.where(AuditLog.created_at >= start_date)
         
         if filters.end_date:
-            query = query.where(AuditLog.created_at <= filters.end_date)
-        
-        query = query.offset(filters.offset).limit(filters.limit).order_by(AuditLog.created_at.desc())
+            end_date = filters.end_date
+            query += lambda q: q.where(AuditLog.created_at <= end_date)
         
-        result = await self.db.execute(query)
-        logs = result.scalars().all()
+        offset, limit = filters.offset, filters.limit
+        query += lambda q: q.offset(offset).limit(limit).order_by(AuditLog.created_at.desc())
         
-        # Convert to response format
-        logs_list = []
-        for log in logs:
-            logs_list.append(AuditLogResponse(
+        # Rows are fetched in batches from a server-side cursor and converted as they arrive
+        logs = await self.db.stream_scalars(query, execution_options={"yield_per": AUDIT_LOG_BATCH_SIZE})
+        async for log in logs:
+            yield AuditLogResponse.model_construct(
                 id=log.id,
                 user_email=log.user.email if log.user else None,
                 action=log.action,
                 resource_type=log.resource_type,
-                resource_id=int(log.resource_id) if log.resource_id and log.resource_id.isdigit() else None,
+                resource_id=log.resource_id_int,
                 details=log.details or {},
-                ip_address=log.ip_address,
+                ip_address=str(log.ip_address) if log.ip_address else None,
                 user_agent=log.user_agent,
                 created_at=log.created_at
-            ))
-        
-        return logs_list
+            )
 
@@ -2,57 +2,153 @@
 Backup service for automated database and file backups
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import Dict, List, Optional, Any
+from sqlalchemy import select, update, delete, func, and_
+from sqlalchemy.orm import aliased
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache
 import asyncio
 import subprocess
 import os
 import shutil
-import tarfile
 import gzip
 import json
+import tempfile
 import logging
 from pathlib import Path
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 from app.models.tenant import Tenant
 from app.models.odoo_instance import OdooInstance
+from app.models.billing import Subscription, Payment, Invoice, Usage, BillingRecord
 from app.models.backup import BackupRecord
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
+# Read size when streaming subprocess output to disk
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Tables holding a tenant's data, in foreign key order, with the predicate
+# selecting one tenant's rows
+TENANT_TABLES = [
+    (Tenant.__table__, "id = {tenant_id}"),
+    (OdooInstance.__table__, "tenant_id = {tenant_id}"),
+    (Subscription.__table__, "tenant_id = {tenant_id}"),
+    (Payment.__table__, "subscription_id IN (SELECT id FROM subscriptions WHERE tenant_id = {tenant_id})"),
+    (Invoice.__table__, "subscription_id IN (SELECT id FROM subscriptions WHERE tenant_id = {tenant_id})"),
+    (Usage.__table__, "tenant_id = {tenant_id}"),
+    (BillingRecord.__table__, "tenant_id = {tenant_id}"),
+]
+
+# Backups are hundreds of MB and up, upload them as 16 MiB parts in parallel,
+# optionally capped so uploads leave bandwidth for application traffic. Parts
+# are read from disk in 1 MiB blocks rather than the 256 KiB default
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=20,
+    io_chunksize=1024 * 1024,
+    use_threads=True,
+    max_bandwidth=settings.S3_UPLOAD_MAX_BANDWIDTH or None
+)
+
+# S3 accepts at most 1000 keys per DeleteObjects request
+S3_DELETE_BATCH_SIZE = 1000
+
+# Restores fetch the backup as parallel 16 MiB byte ranges, written in 1 MiB blocks
+DOWNLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=16,
+    io_chunksize=1024 * 1024,
+    use_threads=True
+)
+
+@lru_cache(maxsize=1)
+def _get_s3_client():
+    """S3 client shared by all BackupService instances"""
+    # Building a client is expensive and its connection pool is thread-safe,
+    # the pool is sized above the transfer concurrency
+    return boto3.client(
+        's3',
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION or 'us-east-1',
+        config=Config(
+            max_pool_connections=50,
+            retries={'max_attempts': 10, 'mode': 'adaptive'},
+            tcp_keepalive=True
+        )
+    )
+
+def _s3_location(s3_bucket: Optional[str], s3_key: Optional[str], s3_url: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Bucket and key of a backup's S3 object, parsed from s3_url for records that predate the split columns"""
+    if s3_key:
+        return s3_bucket, s3_key
+    if s3_url and s3_url.startswith("s3://"):
+        bucket_name, _, key = s3_url[len("s3://"):].partition("/")
+        if bucket_name and key:
+            return bucket_name, key
+    return None
+
+def _read_tail(path: Path, size: int = 4096) -> str:
+    """Last few KiB of a log file, for error messages"""
+    with open(path, 'rb') as f:
+        f.seek(max(path.stat().st_size - size, 0))
+        return f.read().decode(errors="replace")
+
+def _copy_columns(table) -> List[str]:
+    """Columns a COPY can round-trip, generated columns are recomputed on load"""
+    return [column.name for column in table.columns if column.computed is None]
+
 class BackupService:
     """Service for managing backups and disaster recovery"""
     
+    # Shared by all instances so concurrent requests can't pile up dumps and archives
+    _backup_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_BACKUPS)
+    
     def __init__(self, db: AsyncSession):
         self.db = db
         self.backup_base_path = Path(settings.BACKUP_PATH or "/app/backups")
         self.backup_base_path.mkdir(parents=True, exist_ok=True)
         
-        # Initialize S3 client if configured
+        # Use the shared S3 client if configured
         self.s3_client = None
         if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY:
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION or 'us-east-1'
-            )
+            self.s3_client = _get_s3_client()
+    
+    async def _all(self, stmt):
+        """Run a multi-row query on its own session so several can run concurrently"""
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(stmt)).all()
+    
+    async def _scalars(self, stmt):
+        """Run an entity query on its own session so several can run concurrently"""
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(stmt)).scalars().all()
     
     async def create_database_backup(self, tenant_id: Optional[int] = None) -> Dict[str, Any]:
         """Create database backup for specific tenant or entire platform"""
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        
+        if tenant_id:
+            backup_name = f"tenant_{tenant_id}_db_{timestamp}"
+            backup_path = self.backup_base_path / f"{backup_name}.tar.gz"
+        else:
+            backup_name = f"platform_db_{timestamp}"
+            backup_path = self.backup_base_path / f"{backup_name}.dump.tar.gz"
+        
+        # Record the backup as running before any work starts
+        backup_record = await self._start_backup_record(tenant_id, "database", backup_name, backup_path)
+        
         try:
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            
             if tenant_id:
                 # Backup specific tenant's database
-                backup_name = f"tenant_{tenant_id}_db_{timestamp}"
-                backup_path = self.backup_base_path / f"{backup_name}.sql.gz"
-                
-                # Get tenant's database connection info
                 tenant_result = await self.db.execute(
                     select(Tenant).where(Tenant.id == tenant_id)
                 )
@@ -62,40 +158,30 @@ class BackupService:
                     raise ValueError(f"Tenant {tenant_id} not found")
                 
                 # Create tenant-specific database dump
-                await self._dump_tenant_database(tenant, backup_path)
+                async with self._backup_semaphore:
+                    backup_size = await self._dump_tenant_database(tenant, backup_path)
                 
             else:
-                # Backup entire platform database
-                backup_name = f"platform_db_{timestamp}"
-                backup_path = self.backup_base_path / f"{backup_name}.sql.gz"
-                
                 # Create full database dump
-                await self._dump_platform_database(backup_path)
-            
-            # Get backup file size
-            backup_size = backup_path.stat().st_size
+                async with self._backup_semaphore:
+                    backup_size = await self._dump_platform_database(backup_path)
             
             # Upload to S3 if configured
-            s3_url = None
+            s3_url = s3_bucket = s3_key = None
             if self.s3_client and settings.S3_BACKUP_BUCKET:
-                s3_url = await self._upload_to_s3(backup_path, settings.S3_BACKUP_BUCKET)
+                s3_location = await self._upload_to_s3(backup_path, settings.S3_BACKUP_BUCKET)
+                if s3_location:
+                    s3_url, s3_bucket, s3_key = s3_location
             
-            # Create backup record
-            backup_record = BackupRecord(
-                tenant_id=tenant_id,
-                backup_type="database",
-                backup_name=backup_name,
-                file_path=str(backup_path),
+            await self._finish_backup_record(
+                backup_record.id,
+                status="completed",
                 file_size=backup_size,
                 s3_url=s3_url,
-                status="completed",
-                created_at=datetime.utcnow()
+                s3_bucket=s3_bucket,
+                s3_key=s3_key
             )
             
-            self.db.add(backup_record)
-            await self.db.commit()
-            await self.db.refresh(backup_record)
-            
             return {
                 "backup_id": backup_record.id,
                 "backup_name": backup_name,
@@ -107,63 +193,71 @@ class BackupService:
             
         except Exception as e:
             logger.error(f"Database backup failed: {e}")
-            
-            # Create failed backup record
-            backup_record = BackupRecord(
-                tenant_id=tenant_id,
-                backup_type="database",
-                backup_name=f"failed_{timestamp}",
-                status="failed",
-                error_message=str(e),
-                created_at=datetime.utcnow()
-            )
-            
-            self.db.add(backup_record)
-            await self.db.commit()
-            
+            await self._fail_backup_record(backup_record.id, e)
             raise Exception(f"Database backup failed: {e}")
     
-    async def _dump_tenant_database(self, tenant: Tenant, backup_path: Path):
-        """Create database dump for specific tenant"""
-        # This would connect to the tenant's specific database
-        # For now, we'll create a filtered dump of the main database
+    async def _dump_tenant_database(self, tenant: Tenant, backup_path: Path) -> int:
+        """Create database dump for specific tenant, returning its size in bytes"""
+        # Each tenant table is exported with a filtered binary COPY, several
+        # at a time, and the files are archived together
+        staging_path = Path(tempfile.mkdtemp(dir=self.backup_base_path, prefix=f"tenant_{tenant.id}_"))
+        semaphore = asyncio.Semaphore(min(len(TENANT_TABLES), os.cpu_count() or 1))
         
-        cmd = [
-            "pg_dump",
-            f"--host={settings.DATABASE_HOST}",
-            f"--port={settings.DATABASE_PORT}",
-            f"--username={settings.DATABASE_USER}",
-            f"--dbname={settings.DATABASE_NAME}",
-            "--no-password",
-            "--verbose",
-            "--clean",
-            "--no-acl",
-            "--no-owner",
-            f"--where=tenant_id={tenant.id}",  # Filter by tenant
-        ]
+        async def copy_table(table, predicate: str):
+            async with semaphore:
+                columns = ", ".join(_copy_columns(table))
+                where = predicate.format(tenant_id=tenant.id)
+                await self._run_psql_copy(
+                    f"\\copy (SELECT {columns} FROM {table.name} WHERE {where}) TO STDOUT WITH (FORMAT binary)",
+                    staging_path / f"{table.name}.copy"
+                )
         
+        try:
+            await asyncio.gather(*(copy_table(table, predicate) for table, predicate in TENANT_TABLES))
+            return await self._run_tar_archive(
+                ["-C", str(staging_path), *(f"{table.name}.copy" for table, _ in TENANT_TABLES)],
+                backup_path
+            )
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+    
+    async def _run_psql_copy(self, copy_command: str, output_path: Path):
+        """Run a psql \\copy command, writing its output straight to a file"""
         # Set password via environment
         env = os.environ.copy()
         env["PGPASSWORD"] = settings.DATABASE_PASSWORD
         
-        # Run pg_dump and compress
-        with gzip.open(backup_path, 'wt') as f:
+        with open(output_path, 'wb') as f:
             process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
+                *self._psql_command(),
+                "--command", copy_command,
+                stdout=f,
                 stderr=asyncio.subprocess.PIPE,
                 env=env
             )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                raise Exception(f"pg_dump failed: {stderr.decode()}")
-            
-            f.write(stdout.decode())
+        
+        _, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            raise Exception(f"COPY failed: {stderr.decode()}")
+    
+    def _psql_command(self) -> List[str]:
+        """psql invocation for the platform database"""
+        return [
+            "psql",
+            f"--host={settings.DATABASE_HOST}",
+            f"--port={settings.DATABASE_PORT}",
+            f"--username={settings.DATABASE_USER}",
+            f"--dbname={settings.DATABASE_NAME}",
+            "--no-password",
+            "--set=ON_ERROR_STOP=1",
+        ]
     
-    async def _dump_platform_database(self, backup_path: Path):
-        """Create full platform database dump"""
+    async def _dump_platform_database(self, backup_path: Path) -> int:
+        """Create full platform database dump, returning its size in bytes"""
+        # A directory-format dump runs one worker connection per core, the
+        # directory is then archived and compressed by the tar/pigz pipeline
+        staging_path = Path(tempfile.mkdtemp(dir=self.backup_base_path, prefix="platform_"))
         cmd = [
             "pg_dump",
             f"--host={settings.DATABASE_HOST}",
@@ -171,43 +265,76 @@ class BackupService:
             f"--username={settings.DATABASE_USER}",
             f"--dbname={settings.DATABASE_NAME}",
             "--no-password",
-            "--verbose",
+            "--format=directory",
+            f"--jobs={os.cpu_count() or 1}",
+            "--compress=0",
+            f"--file={staging_path / 'dump'}",
             "--clean",
             "--no-acl",
             "--no-owner",
         ]
         
+        try:
+            await self._run_pg_dump(cmd, backup_path)
+            return await self._run_tar_archive(["-C", str(staging_path), "dump"], backup_path)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+    
+    async def _run_pg_dump(self, cmd: List[str], backup_path: Path):
+        """Run pg_dump, logging its stderr next to the backup file"""
         # Set password via environment
         env = os.environ.copy()
         env["PGPASSWORD"] = settings.DATABASE_PASSWORD
         
-        # Run pg_dump and compress
-        with gzip.open(backup_path, 'wt') as f:
+        # stderr goes straight to a log file, nothing to drain here
+        log_path = backup_path.with_name(f"{backup_path.name}.stderr.log")
+        with open(log_path, 'wb') as log:
             process = await asyncio.create_subprocess_exec(
                 *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=log,
                 env=env
             )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                raise Exception(f"pg_dump failed: {stderr.decode()}")
-            
-            f.write(stdout.decode())
+        
+        await process.wait()
+        if process.returncode != 0:
+            raise Exception(f"pg_dump failed: {_read_tail(log_path)}")
+        
+        log_path.unlink(missing_ok=True)
+    
+    async def _copy_stream(self, reader: asyncio.StreamReader, f) -> int:
+        """Copy a subprocess stream into a file object chunk by chunk, returning the byte count"""
+        copied = 0
+        while chunk := await reader.read(STREAM_CHUNK_SIZE):
+            f.write(chunk)
+            copied += len(chunk)
+        return copied
     
     async def create_file_backup(self, tenant_id: Optional[int] = None) -> Dict[str, Any]:
         """Create file backup for tenant data or entire platform"""
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        
+        # Snapshot mode platform backups extend an incremental chain
+        chain_id, level = None, 0
+        incremental = not tenant_id and settings.BACKUP_STRATEGY == "snapshot"
+        
+        if tenant_id:
+            backup_name = f"tenant_{tenant_id}_files_{timestamp}"
+        elif incremental:
+            chain_id, level = await self._next_chain_position()
+            backup_name = f"platform_files_{timestamp}_level{level}"
+        else:
+            backup_name = f"platform_files_{timestamp}"
+        backup_path = self.backup_base_path / f"{backup_name}.tar.gz"
+        
+        # Record the backup as running before any work starts
+        backup_record = await self._start_backup_record(
+            tenant_id, "files", backup_name, backup_path, level=level, chain_id=chain_id
+        )
+        
         try:
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            
             if tenant_id:
                 # Backup specific tenant's files
-                backup_name = f"tenant_{tenant_id}_files_{timestamp}"
-                backup_path = self.backup_base_path / f"{backup_name}.tar.gz"
-                
-                # Get tenant's file paths
                 tenant_result = await self.db.execute(
                     select(Tenant).where(Tenant.id == tenant_id)
                 )
@@ -217,69 +344,122 @@ class BackupService:
                     raise ValueError(f"Tenant {tenant_id} not found")
                 
                 # Create tenant file backup
-                await self._create_tenant_file_backup(tenant, backup_path)
+                async with self._backup_semaphore:
+                    backup_size = await self._create_tenant_file_backup(tenant, backup_path)
                 
             else:
-                # Backup entire platform files
-                backup_name = f"platform_files_{timestamp}"
-                backup_path = self.backup_base_path / f"{backup_name}.tar.gz"
-                
-                # Create full file backup
-                await self._create_platform_file_backup(backup_path)
-            
-            # Get backup file size
-            backup_size = backup_path.stat().st_size
+                # Create full file backup, a snapshot chain's state file is
+                # named after its level 0 record
+                snar_path = None
+                if incremental:
+                    snar_path = self._snar_path(chain_id or backup_record.id)
+                async with self._backup_semaphore:
+                    backup_size = await self._create_platform_file_backup(backup_path, snar_path)
             
             # Upload to S3 if configured
-            s3_url = None
+            s3_url = s3_bucket = s3_key = None
             if self.s3_client and settings.S3_BACKUP_BUCKET:
-                s3_url = await self._upload_to_s3(backup_path, settings.S3_BACKUP_BUCKET)
+                s3_location = await self._upload_to_s3(backup_path, settings.S3_BACKUP_BUCKET)
+                if s3_location:
+                    s3_url, s3_bucket, s3_key = s3_location
             
-            # Create backup record
-            backup_record = BackupRecord(
-                tenant_id=tenant_id,
-                backup_type="files",
-                backup_name=backup_name,
-                file_path=str(backup_path),
+            await self._finish_backup_record(
+                backup_record.id,
+                status="completed",
                 file_size=backup_size,
                 s3_url=s3_url,
-                status="completed",
-                created_at=datetime.utcnow()
+                s3_bucket=s3_bucket,
+                s3_key=s3_key
             )
             
-            self.db.add(backup_record)
-            await self.db.commit()
-            await self.db.refresh(backup_record)
-            
             return {
                 "backup_id": backup_record.id,
                 "backup_name": backup_name,
                 "file_path": str(backup_path),
                 "file_size": backup_size,
+                "level": level,
+                "chain_id": chain_id or backup_record.id,
                 "s3_url": s3_url,
                 "created_at": backup_record.created_at
             }
             
         except Exception as e:
             logger.error(f"File backup failed: {e}")
-            
-            # Create failed backup record
-            backup_record = BackupRecord(
-                tenant_id=tenant_id,
-                backup_type="files",
-                backup_name=f"failed_{timestamp}",
-                status="failed",
-                error_message=str(e),
-                created_at=datetime.utcnow()
-            )
-            
-            self.db.add(backup_record)
-            await self.db.commit()
-            
+            await self._fail_backup_record(backup_record.id, e)
             raise Exception(f"File backup failed: {e}")
     
-    async def _create_tenant_file_backup(self, tenant: Tenant, backup_path: Path):
-        """Create file backup for specific tenant"""
+    async def _start_backup_record(
+        self,
+        tenant_id: Optional[int],
+        backup_type: str,
+        backup_name: str,
+        backup_path: Path,
+        level: int = 0,
+        chain_id: Optional[int] = None
+    ) -> BackupRecord:
+        """Create the record of a backup that is about to run"""
+        backup_record = BackupRecord(
+            tenant_id=tenant_id,
+            backup_type=backup_type,
+            backup_name=backup_name,
+            file_path=str(backup_path),
+            status="running",
+            level=level,
+            chain_id=chain_id,
+            created_at=datetime.utcnow()
+        )
+        
+        self.db.add(backup_record)
+        await self.db.commit()
+        
+        return backup_record
+    
+    async def _finish_backup_record(self, backup_id: int, **values):
+        """Set the final state of a backup record"""
+        await self.db.execute(
+            update(BackupRecord).where(BackupRecord.id == backup_id).values(**values)
+        )
+        await self.db.commit()
+    
+    async def _fail_backup_record(self, backup_id: int, error: Exception):
+        """Mark a backup record as failed"""
+        # Discard whatever the failed step left in the session first
+        await self.db.rollback()
+        await self._finish_backup_record(backup_id, status="failed", error_message=str(error))
+    
+    def _snar_path(self, chain_id: int) -> Path:
+        """GNU tar state file of an incremental chain"""
+        return self.backup_base_path / f"platform_{chain_id}.snar"
+    
+    async def _next_chain_position(self) -> Tuple[Optional[int], int]:
+        """Chain and level of the next snapshot file backup, (None, 0) starts a new chain"""
+        # The newest completed platform file backup, with the level 0 record of its chain
+        base = aliased(BackupRecord)
+        latest = (await self.db.execute(
+            select(BackupRecord.level, base.id, base.created_at)
+            .join(base, base.id == func.coalesce(BackupRecord.chain_id, BackupRecord.id))
+            .where(
+                BackupRecord.tenant_id.is_(None),
+                BackupRecord.backup_type == "files",
+                BackupRecord.status == "completed"
+            )
+            .order_by(BackupRecord.created_at.desc())
+            .limit(1)
+        )).first()
+        
+        if not latest:
+            return None, 0
+        
+        level, chain_id, chain_started = latest
+        # Start over with a full archive once the chain's full archive is old,
+        # or when the chain has no state file (a plain tar backup, or lost)
+        rotate_before = datetime.now(chain_started.tzinfo) - timedelta(days=settings.BACKUP_FULL_INTERVAL_DAYS)
+        if chain_started < rotate_before or not self._snar_path(chain_id).exists():
+            return None, 0
+        return chain_id, level + 1
+    
+    async def _create_tenant_file_backup(self, tenant: Tenant, backup_path: Path) -> int:
+        """Create file backup for specific tenant, returning its size in bytes"""
         # Define tenant-specific file paths
         tenant_paths = [
             f"/app/data/tenants/{tenant.id}",
@@ -287,14 +467,17 @@ class BackupService:
             f"/app/logs/tenants/{tenant.id}"
         ]
         
-        # Create tar.gz archive
-        with tarfile.open(backup_path, 'w:gz') as tar:
-            for path in tenant_paths:
-                if os.path.exists(path):
-                    tar.add(path, arcname=f"tenant_{tenant.id}/{os.path.basename(path)}")
+        # Archive the existing directories under tenant_<id>/
+        existing_paths = [
+            os.path.relpath(path, "/app") for path in tenant_paths if os.path.exists(path)
+        ]
+        return await self._run_tar_archive(
+            ["-C", "/app", f"--transform=s,^,tenant_{tenant.id}/,", *existing_paths],
+            backup_path
+        )
     
-    async def _create_platform_file_backup(self, backup_path: Path):
-        """Create file backup for entire platform"""
+    async def _create_platform_file_backup(self, backup_path: Path, snar_path: Optional[Path] = None) -> int:
+        """Create file backup for entire platform, returning its size in bytes"""
         # Define platform file paths
         platform_paths = [
             "/app/data",
@@ -303,34 +486,146 @@ class BackupService:
             "/app/config"
         ]
         
-        # Create tar.gz archive
-        with tarfile.open(backup_path, 'w:gz') as tar:
-            for path in platform_paths:
-                if os.path.exists(path):
-                    tar.add(path, arcname=os.path.basename(path))
+        # Archive the existing directories by their base name
+        existing_paths = [
+            os.path.basename(path) for path in platform_paths if os.path.exists(path)
+        ]
+        
+        if snar_path is None:
+            return await self._run_tar_archive(["-C", "/app", *existing_paths], backup_path)
+        
+        # Snapshot mode archives read-only btrfs snapshots instead of the live
+        # directories, as GNU incremental archives that only hold what changed
+        # since the previous archive of the chain. A missing state file makes a
+        # level 0 full archive. Restoring extracts the chain's archives from
+        # level 0 up with --listed-incremental=/dev/null
+        snapshot_root = self.backup_base_path / "snapshots"
+        snapshot_root.mkdir(exist_ok=True)
+        
+        # tar rewrites the state file as it goes, work on a copy so a failed
+        # run leaves the chain where the last completed archive left it
+        work_snar_path = snar_path.with_suffix(".snar.tmp")
+        if snar_path.exists():
+            await asyncio.to_thread(shutil.copyfile, snar_path, work_snar_path)
+        else:
+            work_snar_path.unlink(missing_ok=True)
+        
+        tar_args = [
+            f"--listed-incremental={work_snar_path}",
+            # Every snapshot is a new device, files are matched by inode alone
+            "--no-check-device",
+        ]
+        snapshots = []
+        
+        try:
+            for name in existing_paths:
+                snapshot_path = snapshot_root / name
+                if await self._create_snapshot(Path("/app") / name, snapshot_path):
+                    snapshots.append(snapshot_path)
+                    tar_args += ["-C", str(snapshot_root), name]
+                else:
+                    # Not a subvolume, archived live
+                    tar_args += ["-C", "/app", name]
+            
+            backup_size = await self._run_tar_archive(tar_args, backup_path)
+            os.replace(work_snar_path, snar_path)
+            return backup_size
+        finally:
+            work_snar_path.unlink(missing_ok=True)
+            for snapshot_path in snapshots:
+                await self._run_btrfs("subvolume", "delete", str(snapshot_path))
+    
+    async def _create_snapshot(self, source_path: Path, snapshot_path: Path) -> bool:
+        """Take a read-only btrfs snapshot, returning whether it was created"""
+        # Clear a snapshot left behind by an interrupted run
+        if snapshot_path.exists():
+            await self._run_btrfs("subvolume", "delete", str(snapshot_path))
+        
+        returncode, stderr = await self._run_btrfs(
+            "subvolume", "snapshot", "-r", str(source_path), str(snapshot_path)
+        )
+        if returncode != 0:
+            logger.warning(f"Snapshot of {source_path} failed: {stderr}")
+            return False
+        return True
+    
+    async def _run_btrfs(self, *args: str) -> Tuple[int, str]:
+        """Run a btrfs command, returning its exit status and stderr"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "btrfs", *args,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            return 127, "btrfs is not installed"
+        _, stderr = await process.communicate()
+        return process.returncode, stderr.decode()
+    
+    async def _run_tar_archive(self, tar_args: List[str], backup_path: Path) -> int:
+        """Create a tar.gz archive with tar piped through pigz, returning its size in bytes"""
+        # tar walks the tree and pigz compresses on every core, the pipe is
+        # connected directly between the two processes
+        read_fd, write_fd = os.pipe()
+        try:
+            tar = await asyncio.create_subprocess_exec(
+                # The trailing empty file list keeps tar from refusing to
+                # create an archive when none of the paths exist
+                "tar", "-cf", "-", *tar_args, "--files-from=/dev/null",
+                stdout=write_fd,
+                stderr=asyncio.subprocess.PIPE
+            )
+            pigz = await asyncio.create_subprocess_exec(
+                "pigz", "-1", "-p", str(os.cpu_count() or 1),
+                stdin=read_fd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+        
+        # The compressed output is counted on its way to disk
+        with open(backup_path, 'wb') as f:
+            backup_size, (_, tar_stderr), pigz_stderr = await asyncio.gather(
+                self._copy_stream(pigz.stdout, f),
+                tar.communicate(),
+                pigz.stderr.read()
+            )
+        await pigz.wait()
+        
+        # tar exits with 1 when files changed while being read, expected for live logs
+        if tar.returncode > 1:
+            raise Exception(f"tar failed: {tar_stderr.decode()}")
+        if pigz.returncode != 0:
+            raise Exception(f"pigz failed: {pigz_stderr.decode()}")
+        
+        return backup_size
     
-    async def _upload_to_s3(self, file_path: Path, bucket_name: str) -> Optional[str]:
-        """Upload backup file to S3"""
+    async def _upload_to_s3(self, file_path: Path, bucket_name: str) -> Optional[Tuple[str, str, str]]:
+        """Upload backup file to S3, returning its URL, bucket and key"""
         if not self.s3_client:
             return None
         
         try:
             s3_key = f"backups/{file_path.name}"
             
-            # Upload file
-            self.s3_client.upload_file(
+            # Upload file in a worker thread, it can take minutes
+            await asyncio.to_thread(
+                self.s3_client.upload_file,
                 str(file_path),
                 bucket_name,
                 s3_key,
                 ExtraArgs={
                     'ServerSideEncryption': 'AES256',
                     'StorageClass': 'STANDARD_IA'  # Infrequent Access for cost optimization
-                }
+                },
+                Config=UPLOAD_TRANSFER_CONFIG
             )
             
             # Generate S3 URL
             s3_url = f"s3://{bucket_name}/{s3_key}"
-            return s3_url
+            return s3_url, bucket_name, s3_key
             
         except ClientError as e:
             logger.error(f"S3 upload failed: {e}")
@@ -353,8 +648,9 @@ class BackupService:
             
             # Download from S3 if needed
             restore_path = Path(backup.file_path)
-            if backup.s3_url and not restore_path.exists():
-                restore_path = await self._download_from_s3(backup.s3_url)
+            s3_location = _s3_location(backup.s3_bucket, backup.s3_key, backup.s3_url)
+            if s3_location and not restore_path.exists():
+                restore_path = await self._download_from_s3(*s3_location)
             
             if not restore_path.exists():
                 raise ValueError("Backup file not found")
@@ -374,6 +670,20 @@ class BackupService:
     
     async def _restore_database_from_file(self, backup_path: Path, tenant_id: Optional[int] = None):
         """Restore database from backup file"""
+        # pg_dump archives go through pg_restore, tenant COPY archives are
+        # loaded table by table and older .sql.gz dumps go through psql
+        if backup_path.name.endswith(".dump.tar.gz"):
+            await self._restore_database_from_directory(backup_path)
+            return
+        
+        if backup_path.suffix == ".dump":
+            await self._restore_database_from_archive(backup_path)
+            return
+        
+        if tenant_id and backup_path.name.endswith(".tar.gz"):
+            await self._restore_tenant_tables(backup_path, tenant_id)
+            return
+        
         if tenant_id:
             # Restore specific tenant data
             # This would involve careful restoration to avoid conflicts
@@ -401,116 +711,253 @@ class BackupService:
         env["PGPASSWORD"] = settings.DATABASE_PASSWORD
         
         # Restore from compressed backup
-        with gzip.open(backup_path, 'rt') as f:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+        
+        async def feed_stdin():
+            # Decompress in a worker thread and hand psql one chunk at a time
+            try:
+                with gzip.open(backup_path, 'rb') as f:
+                    while chunk := await asyncio.to_thread(f.read, STREAM_CHUNK_SIZE):
+                        process.stdin.write(chunk)
+                        await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # psql exited early, its exit status carries the error
+            finally:
+                process.stdin.close()
+        
+        _, stderr = await asyncio.gather(feed_stdin(), process.stderr.read())
+        await process.wait()
+        
+        if process.returncode != 0:
+            raise Exception(f"Database restore failed: {stderr.decode()}")
+    
+    async def _restore_database_from_archive(self, backup_path: Path):
+        """Restore database from a custom or directory format pg_dump archive"""
+        cmd = [
+            "pg_restore",
+            f"--host={settings.DATABASE_HOST}",
+            f"--port={settings.DATABASE_PORT}",
+            f"--username={settings.DATABASE_USER}",
+            f"--dbname={settings.DATABASE_NAME}",
+            "--no-password",
+            "--clean",
+            "--if-exists",
+            "--no-acl",
+            "--no-owner",
+            f"--jobs={os.cpu_count() or 1}",
+            str(backup_path),
+        ]
+        
+        # Set password via environment
+        env = os.environ.copy()
+        env["PGPASSWORD"] = settings.DATABASE_PASSWORD
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+        
+        stdout, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            raise Exception(f"Database restore failed: {stderr.decode()}")
+    
+    async def _restore_database_from_directory(self, backup_path: Path):
+        """Restore database from an archived directory-format pg_dump"""
+        staging_path = Path(tempfile.mkdtemp(dir=self.backup_base_path, prefix="platform_"))
+        
+        try:
+            await self._extract_archive(backup_path, staging_path)
+            await self._restore_database_from_archive(staging_path / "dump")
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+    
+    async def _extract_archive(self, backup_path: Path, staging_path: Path):
+        """Extract a tar.gz backup into a staging directory"""
+        process = await asyncio.create_subprocess_exec(
+            "tar", "-xzf", str(backup_path), "-C", str(staging_path),
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            raise Exception(f"Backup extraction failed: {stderr.decode()}")
+    
+    async def _restore_tenant_tables(self, backup_path: Path, tenant_id: int):
+        """Replace a tenant's rows with the per-table COPY files of a backup"""
+        staging_path = Path(tempfile.mkdtemp(dir=self.backup_base_path, prefix=f"tenant_{tenant_id}_"))
+        
+        try:
+            await self._extract_archive(backup_path, staging_path)
+            
+            # Existing rows are removed in reverse foreign key order and the copies
+            # loaded in order, all in one transaction
+            script = ["BEGIN;"]
+            for table, predicate in reversed(TENANT_TABLES):
+                script.append(f"DELETE FROM {table.name} WHERE {predicate.format(tenant_id=tenant_id)};")
+            for table, _ in TENANT_TABLES:
+                columns = ", ".join(_copy_columns(table))
+                copy_path = staging_path / f"{table.name}.copy"
+                script.append(f"\\copy {table.name} ({columns}) FROM '{copy_path}' WITH (FORMAT binary)")
+            script.append("COMMIT;")
+            
+            # Set password via environment
+            env = os.environ.copy()
+            env["PGPASSWORD"] = settings.DATABASE_PASSWORD
+            
             process = await asyncio.create_subprocess_exec(
-                *cmd,
+                *self._psql_command(),
                 stdin=asyncio.subprocess.PIPE,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 env=env
             )
             
-            stdout, stderr = await process.communicate(input=f.read().encode())
+            stdout, stderr = await process.communicate(input="\n".join(script).encode())
             
             if process.returncode != 0:
                 raise Exception(f"Database restore failed: {stderr.decode()}")
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
     
-    async def _download_from_s3(self, s3_url: str) -> Path:
+    async def _download_from_s3(self, bucket_name: str, s3_key: str) -> Path:
         """Download backup file from S3"""
         if not self.s3_client:
             raise Exception("S3 client not configured")
         
-        # Parse S3 URL
-        s3_parts = s3_url.replace("s3://", "").split("/", 1)
-        bucket_name = s3_parts[0]
-        s3_key = s3_parts[1]
-        
-        # Download to temporary location
-        download_path = self.backup_base_path / f"temp_{s3_key.split('/')[-1]}"
+        # Download to a unique temporary file so concurrent restores don't clobber
+        # each other, the original name is kept at the end for format detection
+        with tempfile.NamedTemporaryFile(
+            dir=self.backup_base_path,
+            prefix="temp_",
+            suffix=f"_{s3_key.split('/')[-1]}",
+            delete=False
+        ) as tmp:
+            download_path = Path(tmp.name)
         
         try:
-            self.s3_client.download_file(bucket_name, s3_key, str(download_path))
+            await asyncio.to_thread(
+                self.s3_client.download_file,
+                bucket_name,
+                s3_key,
+                str(download_path),
+                Config=DOWNLOAD_TRANSFER_CONFIG
+            )
             return download_path
         except ClientError as e:
+            download_path.unlink(missing_ok=True)
             raise Exception(f"S3 download failed: {e}")
     
     async def cleanup_old_backups(self, retention_days: int = 30) -> Dict[str, Any]:
         """Clean up old backup files"""
         cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
         
-        # Get old backup records
+        # Incremental archives are useless without the rest of their chain, so
+        # a chain expires as a whole once its newest member is past the cutoff.
+        # Backups outside a chain are a chain of one
+        chain = func.coalesce(BackupRecord.chain_id, BackupRecord.id)
+        expired_chains = (
+            select(chain)
+            .group_by(chain)
+            .having(func.max(BackupRecord.created_at) < cutoff_date)
+        )
+        
+        # Delete expired records in one statement, the returned paths drive the file cleanup
         old_backups_result = await self.db.execute(
-            select(BackupRecord).where(BackupRecord.created_at < cutoff_date)
+            delete(BackupRecord)
+            .where(chain.in_(expired_chains))
+            .returning(
+                BackupRecord.id, BackupRecord.chain_id, BackupRecord.file_path,
+                BackupRecord.s3_bucket, BackupRecord.s3_key, BackupRecord.s3_url
+            )
         )
-        old_backups = old_backups_result.scalars().all()
+        old_backups = old_backups_result.all()
         
-        deleted_count = 0
-        freed_space = 0
+        # Delete local files, including the state files of expired chains, off the event loop
+        freed_space = await asyncio.to_thread(
+            self._remove_local_files,
+            [backup.file_path for backup in old_backups if backup.file_path] + [
+                str(self._snar_path(backup.id)) for backup in old_backups if backup.chain_id is None
+            ]
+        )
         
-        for backup in old_backups:
-            try:
-                # Delete local file if exists
-                if backup.file_path and os.path.exists(backup.file_path):
-                    file_size = os.path.getsize(backup.file_path)
-                    os.remove(backup.file_path)
-                    freed_space += file_size
-                
-                # Delete from S3 if exists
-                if backup.s3_url and self.s3_client:
-                    s3_parts = backup.s3_url.replace("s3://", "").split("/", 1)
-                    bucket_name = s3_parts[0]
-                    s3_key = s3_parts[1]
-                    
-                    try:
-                        self.s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
-                    except ClientError:
-                        pass  # Continue even if S3 deletion fails
-                
-                # Delete backup record
-                await self.db.delete(backup)
-                deleted_count += 1
-                
-            except Exception as e:
-                logger.warning(f"Failed to delete backup {backup.id}: {e}")
+        # Collect S3 objects per bucket for batched deletion
+        s3_keys: Dict[str, List[str]] = {}
+        if self.s3_client:
+            for backup in old_backups:
+                s3_location = _s3_location(backup.s3_bucket, backup.s3_key, backup.s3_url)
+                if s3_location:
+                    bucket_name, key = s3_location
+                    s3_keys.setdefault(bucket_name, []).append(key)
+        
+        # Delete from S3, one request per S3_DELETE_BATCH_SIZE keys
+        for bucket_name, keys in s3_keys.items():
+            for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+                batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+                try:
+                    await asyncio.to_thread(
+                        self.s3_client.delete_objects,
+                        Bucket=bucket_name,
+                        Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                    )
+                except ClientError:
+                    pass  # Continue even if S3 deletion fails
         
         await self.db.commit()
         
         return {
-            "deleted_backups": deleted_count,
+            "deleted_backups": len(old_backups),
             "freed_space_bytes": freed_space,
             "retention_days": retention_days
         }
     
+    def _remove_local_files(self, file_paths: List[str]) -> int:
+        """Remove local backup files, returning the number of bytes freed"""
+        freed_space = 0
+        for file_path in file_paths:
+            try:
+                if os.path.exists(file_path):
+                    file_size = os.path.getsize(file_path)
+                    os.remove(file_path)
+                    freed_space += file_size
+            except OSError as e:
+                logger.warning(f"Failed to delete backup file {file_path}: {e}")
+        return freed_space
+    
     async def get_backup_status(self) -> Dict[str, Any]:
         """Get backup system status and statistics"""
-        # Get backup counts by type and status
-        backup_stats_result = await self.db.execute(
-            select(
-                BackupRecord.backup_type,
-                BackupRecord.status,
-                func.count(BackupRecord.id).label('count'),
-                func.sum(BackupRecord.file_size).label('total_size')
-            ).group_by(BackupRecord.backup_type, BackupRecord.status)
-        )
-        backup_stats = backup_stats_result.all()
-        
-        # Get recent backups
-        recent_backups_result = await self.db.execute(
-            select(BackupRecord).order_by(BackupRecord.created_at.desc()).limit(10)
+        # Counts, sizes and age by type and status in a single grouped query,
+        # fetched concurrently with the most recent backups
+        backup_stats, recent_backups = await asyncio.gather(
+            self._all(
+                select(
+                    BackupRecord.backup_type,
+                    BackupRecord.status,
+                    func.count().label('count'),
+                    func.sum(BackupRecord.file_size).label('total_size'),
+                    func.min(BackupRecord.created_at).label('oldest')
+                ).group_by(BackupRecord.backup_type, BackupRecord.status)
+            ),
+            self._scalars(
+                select(BackupRecord).order_by(BackupRecord.created_at.desc()).limit(10)
+            )
         )
-        recent_backups = recent_backups_result.scalars().all()
         
         # Calculate total storage used
-        total_size_result = await self.db.execute(
-            select(func.sum(BackupRecord.file_size)).where(BackupRecord.status == "completed")
+        total_storage = sum(
+            stat.total_size or 0 for stat in backup_stats if stat.status == "completed"
         )
-        total_storage = total_size_result.scalar() or 0
         
-        # Get oldest and newest backups
-        oldest_backup_result = await self.db.execute(
-            select(BackupRecord).order_by(BackupRecord.created_at.asc()).limit(1)
-        )
-        oldest_backup = oldest_backup_result.scalar_one_or_none()
+        # Oldest backup across all groups
+        oldest_backup = min((stat.oldest for stat in backup_stats if stat.oldest), default=None)
         
         return {
             "total_backups": sum(stat.count for stat in backup_stats),
@@ -530,13 +977,14 @@ class BackupService:
                     "tenant_id": backup.tenant_id,
                     "type": backup.backup_type,
                     "name": backup.backup_name,
+                    "level": backup.level,
                     "status": backup.status,
                     "size": backup.file_size,
                     "created_at": backup.created_at
                 }
                 for backup in recent_backups
             ],
-            "oldest_backup": oldest_backup.created_at if oldest_backup else None,
+            "oldest_backup": oldest_backup,
             "s3_configured": self.s3_client is not None
         }
     
@@ -1,26 +1,130 @@
 """
 Billing management service
 """
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Tuple
+import asyncio
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload, joinedload
 from datetime import datetime, timedelta
 from decimal import Decimal
 import stripe
+from cachetools import TTLCache
+from fastapi import BackgroundTasks
 
-from app.models.billing import SubscriptionPlan, Subscription, Payment, Invoice, Usage
+from app.models.billing import SubscriptionPlan, Subscription, Payment, Invoice, Usage, SubscriptionStatus, PaymentStatus
 from app.models.tenant import Tenant
+from app.models.user import User
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.cache import cache_get, cache_set, cache_delete
 from app.schemas.billing import (
-    SubscriptionPlanCreate, SubscriptionPlanResponse,
+    SubscriptionPlanCreate, SubscriptionPlanResponse, SubscriptionPlanSnapshot,
     SubscriptionCreate, SubscriptionResponse,
     PaymentCreate, PaymentResponse,
     BillingStatsResponse
 )
 
-# Configure Stripe
+logger = logging.getLogger(__name__)
+
+# Configure Stripe, one pooled client with a short timeout; connection errors,
+# 409s and 5xx responses are retried with jittered backoff by the SDK
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.default_http_client = stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT)
+stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+
+# Plans rarely change, read-only snapshots of loaded plans are kept per process
+# and dropped when a plan is created
+_PLAN_CACHE = TTLCache(maxsize=256, ttl=3600)
+
+# Statuses covered by the one-live-subscription-per-tenant unique index
+LIVE_SUBSCRIPTION_STATUSES = [SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING]
+# Inline form of the index predicate, ON CONFLICT inference can't match bound parameters
+LIVE_SUBSCRIPTION_PREDICATE = text("status IN ('ACTIVE', 'TRIALING')")
+
+# Active subscription per tenant, dropped when a subscription is created or cancelled
+TENANT_SUBSCRIPTION_CACHE_KEY = "tenant:{tenant_id}:subscription"
+
+# Usage datapoints are written in multi-row inserts of up to USAGE_BATCH_SIZE rows,
+# a partial batch is flushed after USAGE_FLUSH_INTERVAL seconds
+USAGE_BATCH_SIZE = 1000
+USAGE_FLUSH_INTERVAL = 1.0
+
+# date_trunc precisions accepted for bucketed usage queries
+USAGE_BUCKETS = ("minute", "hour", "day", "week", "month")
+
+class UsageBuffer:
+    """Queue of usage rows drained by a single writer task"""
+    
+    def __init__(self, batch_size: int = USAGE_BATCH_SIZE, max_wait: float = USAGE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        # Bounded so producers wait instead of piling up rows while the database is slow
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * 10)
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the writer task, called from the application lifespan"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._writer_done)
+    
+    def _writer_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Usage record writer stopped", exc_info=task.exception())
+    
+    async def stop(self):
+        """Flush queued rows and stop the writer task"""
+        if self._task is not None:
+            if not self._task.done():
+                await self._queue.put(None)
+                await asyncio.wait([self._task])
+            self._task = None
+    
+    async def put(self, row: Dict[str, Any]):
+        await self._queue.put(row)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            rows = [row]
+            deadline = loop.time() + self.max_wait
+            while len(rows) < self.batch_size:
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                rows.append(row)
+            await self._write(rows)
+    
+    async def _write(self, rows: List[Dict[str, Any]]):
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(Usage), rows)
+                await session.commit()
+        except Exception:
+            # Connection failures surface as OSError/TimeoutError, not only
+            # SQLAlchemyError, the writer has to survive all of them
+            logger.exception(f"Failed to write {len(rows)} usage records")
+
+usage_buffer = UsageBuffer()
+
+async def cancel_stripe_subscription(stripe_subscription_id: str):
+    """Cancel a subscription in Stripe, failures are logged since the local
+    cancellation already happened and webhooks reconcile the rest"""
+    try:
+        await asyncio.to_thread(stripe.Subscription.delete, stripe_subscription_id)
+    except stripe.error.StripeError as e:
+        logger.error(f"Failed to cancel Stripe subscription {stripe_subscription_id}: {e}")
 
 class BillingService:
     """Service for billing and subscription management"""
@@ -28,10 +132,16 @@ class BillingService:
     def __init__(self, db: AsyncSession):
         self.db = db
     
+    async def _one(self, stmt):
+        """Run an aggregate query on its own session so several can run concurrently"""
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(stmt)).one()
+    
     # Subscription Plans
     async def create_plan(self, plan_data: SubscriptionPlanCreate) -> SubscriptionPlan:
         """Create a new subscription plan"""
-        plan = SubscriptionPlan(
+        # RETURNING hands back the server defaults without a refresh query
+        result = await self.db.execute(insert(SubscriptionPlan).values(
             name=plan_data.name,
             description=plan_data.description,
             price=plan_data.price,
@@ -41,29 +151,43 @@ class BillingService:
             max_users=plan_data.max_users,
             storage_gb=plan_data.storage_gb,
             features=plan_data.features or []
-        )
-        
-        self.db.add(plan)
+        ).returning(SubscriptionPlan))
+        plan = result.scalar_one()
         await self.db.commit()
-        await self.db.refresh(plan)
+        
+        _PLAN_CACHE.clear()
         
         return plan
     
-    async def get_plans(self, active_only: bool = True) -> List[SubscriptionPlan]:
+    async def get_plans(self, active_only: bool = True) -> List[SubscriptionPlanSnapshot]:
         """Get all subscription plans"""
-        query = select(SubscriptionPlan)
-        if active_only:
-            query = query.where(SubscriptionPlan.is_active == True)
+        plans = _PLAN_CACHE.get(("all", active_only))
+        if plans is None:
+            query = select(SubscriptionPlan)
+            if active_only:
+                query = query.where(SubscriptionPlan.is_active == True)
+            
+            result = await self.db.execute(query.order_by(SubscriptionPlan.price))
+            plans = _PLAN_CACHE[("all", active_only)] = tuple(
+                SubscriptionPlanSnapshot.model_validate(plan) for plan in result.scalars()
+            )
         
-        result = await self.db.execute(query.order_by(SubscriptionPlan.price))
-        return result.scalars().all()
+        # Callers get their own copies, the cached snapshots are shared
+        return [plan.model_copy(deep=True) for plan in plans]
     
-    async def get_plan_by_id(self, plan_id: int) -> Optional[SubscriptionPlan]:
+    async def get_plan_by_id(self, plan_id: int) -> Optional[SubscriptionPlanSnapshot]:
         """Get subscription plan by ID"""
-        result = await self.db.execute(
-            select(SubscriptionPlan).where(SubscriptionPlan.id == plan_id)
-        )
-        return result.scalar_one_or_none()
+        plan = _PLAN_CACHE.get(("id", plan_id))
+        if plan is None:
+            result = await self.db.execute(
+                select(SubscriptionPlan).where(SubscriptionPlan.id == plan_id)
+            )
+            row = result.scalar_one_or_none()
+            if row is None:
+                return None
+            plan = _PLAN_CACHE[("id", plan_id)] = SubscriptionPlanSnapshot.model_validate(row)
+        
+        return plan.model_copy(deep=True)
     
     # Subscriptions
     async def create_subscription(self, subscription_data: SubscriptionCreate) -> Subscription:
@@ -72,36 +196,62 @@ class BillingService:
         if not plan:
             raise ValueError("Subscription plan not found")
         
-        # Check if tenant already has an active subscription
-        existing = await self.db.execute(
-            select(Subscription).where(
-                Subscription.tenant_id == subscription_data.tenant_id,
-                Subscription.status.in_(['active', 'trialing'])
-            )
-        )
-        if existing.scalar_one_or_none():
-            raise ValueError("Tenant already has an active subscription")
-        
         # Create Stripe subscription if payment method provided
         stripe_subscription_id = None
+        stripe_customer_id = None
         if subscription_data.payment_method_id:
-            try:
-                # Create Stripe customer and subscription
-                tenant = await self.db.execute(
-                    select(Tenant).where(Tenant.id == subscription_data.tenant_id)
+            # Fail fast before charging, the unique index below settles races
+            existing = await self.db.execute(
+                select(Subscription.id).where(
+                    Subscription.tenant_id == subscription_data.tenant_id,
+                    Subscription.status.in_(LIVE_SUBSCRIPTION_STATUSES)
                 )
-                tenant = tenant.scalar_one()
+            )
+            if existing.first():
+                raise ValueError("Tenant already has an active subscription")
+            
+            try:
+                # Create Stripe customer and subscription, only the fields Stripe needs are loaded
+                tenant = (await self.db.execute(
+                    select(Tenant.name, Tenant.stripe_customer_id, User.email)
+                    .join(User, User.id == Tenant.owner_id)
+                    .where(Tenant.id == subscription_data.tenant_id)
+                )).one()
+                stripe_customer_id = tenant.stripe_customer_id
                 
-                stripe_customer = stripe.Customer.create(
-                    email=tenant.owner.email,
-                    name=tenant.name,
-                    payment_method=subscription_data.payment_method_id
-                )
+                # The SDK is synchronous, calls run in a thread to keep the event loop free.
+                # Idempotency keys make client retries of this request reuse Stripe's
+                # first result instead of creating duplicates
+                if stripe_customer_id:
+                    # Re-subscribing tenants reuse their customer
+                    await asyncio.to_thread(
+                        stripe.PaymentMethod.attach,
+                        subscription_data.payment_method_id,
+                        customer=stripe_customer_id
+                    )
+                else:
+                    stripe_customer = await asyncio.to_thread(
+                        stripe.Customer.create,
+                        email=tenant.email,
+                        name=tenant.name,
+                        payment_method=subscription_data.payment_method_id,
+                        idempotency_key=f"cust:{subscription_data.tenant_id}:{subscription_data.payment_method_id}"
+                    )
+                    stripe_customer_id = stripe_customer.id
+                    # Kept even if the subscription below fails
+                    await self.db.execute(
+                        update(Tenant)
+                        .where(Tenant.id == subscription_data.tenant_id)
+                        .values(stripe_customer_id=stripe_customer_id)
+                    )
+                    await self.db.commit()
                 
-                stripe_subscription = stripe.Subscription.create(
-                    customer=stripe_customer.id,
+                stripe_subscription = await asyncio.to_thread(
+                    stripe.Subscription.create,
+                    customer=stripe_customer_id,
                     items=[{'price': plan.stripe_price_id}],
-                    default_payment_method=subscription_data.payment_method_id
+                    default_payment_method=subscription_data.payment_method_id,
+                    idempotency_key=f"sub:{subscription_data.tenant_id}:{plan.id}:{subscription_data.payment_method_id}"
                 )
                 
                 stripe_subscription_id = stripe_subscription.id
@@ -110,66 +260,106 @@ class BillingService:
                 raise ValueError(f"Payment processing failed: {str(e)}")
         
         # Create subscription
-        subscription = Subscription(
+        result = await self.db.execute(insert(Subscription).values(
             tenant_id=subscription_data.tenant_id,
             plan_id=subscription_data.plan_id,
             status='trialing' if not subscription_data.payment_method_id else 'active',
             current_period_start=datetime.utcnow(),
             current_period_end=datetime.utcnow() + timedelta(days=30),
             trial_end=datetime.utcnow() + timedelta(days=14) if not subscription_data.payment_method_id else None,
-            stripe_subscription_id=stripe_subscription_id
-        )
-        
-        self.db.add(subscription)
+            stripe_subscription_id=stripe_subscription_id,
+            stripe_customer_id=stripe_customer_id
+        ).on_conflict_do_nothing(
+            index_elements=[Subscription.tenant_id],
+            index_where=LIVE_SUBSCRIPTION_PREDICATE
+        ).returning(Subscription))
+        subscription = result.scalar_one_or_none()
+        if subscription is None:
+            # A concurrent request won, undo the Stripe subscription made for this one
+            if stripe_subscription_id:
+                await cancel_stripe_subscription(stripe_subscription_id)
+            raise ValueError("Tenant already has an active subscription")
         await self.db.commit()
-        await self.db.refresh(subscription)
+        
+        await cache_delete(TENANT_SUBSCRIPTION_CACHE_KEY.format(tenant_id=subscription.tenant_id))
         
         return subscription
     
     async def get_subscription_by_id(self, subscription_id: int) -> Optional[Subscription]:
         """Get subscription by ID"""
+        # A single row, joining the plan and tenant costs less than separate loads
         result = await self.db.execute(
             select(Subscription)
-            .options(selectinload(Subscription.plan))
-            .options(selectinload(Subscription.tenant))
+            .options(joinedload(Subscription.plan))
+            .options(joinedload(Subscription.tenant))
             .where(Subscription.id == subscription_id)
         )
         return result.scalar_one_or_none()
     
-    async def get_tenant_subscription(self, tenant_id: int) -> Optional[Subscription]:
-        """Get active subscription for tenant"""
-        result = await self.db.execute(
-            select(Subscription)
-            .options(selectinload(Subscription.plan))
-            .where(
-                Subscription.tenant_id == tenant_id,
-                Subscription.status.in_(['active', 'trialing', 'past_due'])
-            )
-            .order_by(Subscription.created_at.desc())
-        )
-        return result.scalar_one_or_none()
-    
-    async def cancel_subscription(self, subscription_id: int) -> bool:
-        """Cancel subscription"""
-        subscription = await self.get_subscription_by_id(subscription_id)
-        if not subscription:
-            return False
+    async def get_tenant_subscription(
+        self,
+        tenant_id: int,
+        cache: Optional[Dict[int, Optional[SubscriptionResponse]]] = None
+    ) -> Optional[SubscriptionResponse]:
+        """Get active subscription for tenant
         
-        # Cancel in Stripe if exists
-        if subscription.stripe_subscription_id:
-            try:
-                stripe.Subscription.delete(subscription.stripe_subscription_id)
-            except stripe.error.StripeError:
-                pass  # Continue with local cancellation
+        Lookups go through the optional per-request ``cache`` dict, then Redis,
+        then the database.
+        """
+        if cache is not None and tenant_id in cache:
+            return cache[tenant_id]
         
+        key = TENANT_SUBSCRIPTION_CACHE_KEY.format(tenant_id=tenant_id)
+        cached = await cache_get(key)
+        if cached:
+            subscription = SubscriptionResponse.model_validate_json(cached)
+        else:
+            result = await self.db.execute(
+                select(Subscription)
+                .options(selectinload(Subscription.plan))
+                .where(
+                    Subscription.tenant_id == tenant_id,
+                    Subscription.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING, SubscriptionStatus.PAST_DUE])
+                )
+                .order_by(Subscription.created_at.desc())
+                .limit(1)
+            )
+            subscription = result.scalar_one_or_none()
+            if subscription is not None:
+                subscription = SubscriptionResponse.model_validate(subscription)
+                await cache_set(key, subscription.model_dump_json(), settings.SUBSCRIPTION_CACHE_TTL)
+        
+        if cache is not None:
+            cache[tenant_id] = subscription
+        return subscription
+    
+    async def cancel_subscription(
+        self,
+        subscription_id: int,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> bool:
+        """Cancel subscription, the Stripe side is cancelled after the response when background tasks are given"""
         # Update local subscription
-        await self.db.execute(
+        result = await self.db.execute(
             update(Subscription)
             .where(Subscription.id == subscription_id)
-            .values(status='cancelled', updated_at=datetime.utcnow())
+            .values(status='cancelled')
+            .returning(Subscription.tenant_id, Subscription.stripe_subscription_id)
         )
+        subscription = result.first()
+        if not subscription:
+            return False
         await self.db.commit()
         
+        await cache_delete(TENANT_SUBSCRIPTION_CACHE_KEY.format(tenant_id=subscription.tenant_id))
+        
+        # Cancel in Stripe if exists
+        if subscription.stripe_subscription_id:
+            if background_tasks is not None:
+                background_tasks.add_task(cancel_stripe_subscription, subscription.stripe_subscription_id)
+            else:
+                await cancel_stripe_subscription(subscription.stripe_subscription_id)
+        
         return True
     
     # Payments
@@ -182,12 +372,19 @@ class BillingService:
         # Create Stripe payment intent
         stripe_payment_intent_id = None
         try:
-            payment_intent = stripe.PaymentIntent.create(
+            payment_intent = await asyncio.to_thread(
+                stripe.PaymentIntent.create,
                 amount=int(payment_data.amount * 100),  # Convert to cents
                 currency=payment_data.currency.lower(),
                 payment_method=payment_data.payment_method_id,
                 confirm=True,
-                return_url="https://your-domain.com/return"
+                return_url="https://your-domain.com/return",
+                # Retries carrying the client's request id collapse into one
+                # charge, without one every call is a new charge
+                idempotency_key=(
+                    f"pi:{payment_data.subscription_id}:{payment_data.request_id}"
+                    if payment_data.request_id else None
+                )
             )
             stripe_payment_intent_id = payment_intent.id
             
@@ -205,17 +402,15 @@ class BillingService:
             raise ValueError(f"Payment failed: {str(e)}")
         
         # Create successful payment record
-        payment = Payment(
+        result = await self.db.execute(insert(Payment).values(
             subscription_id=payment_data.subscription_id,
             amount=payment_data.amount,
             currency=payment_data.currency,
             status='completed',
             stripe_payment_intent_id=stripe_payment_intent_id
-        )
-        
-        self.db.add(payment)
+        ).returning(Payment))
+        payment = result.scalar_one()
         await self.db.commit()
-        await self.db.refresh(payment)
         
         return payment
     
@@ -229,20 +424,14 @@ class BillingService:
         return result.scalars().all()
     
     # Usage tracking
-    async def record_usage(self, tenant_id: int, metric_name: str, value: int) -> Usage:
-        """Record usage metric"""
-        usage = Usage(
+    async def record_usage(self, tenant_id: int, metric_name: str, value: int) -> None:
+        """Record usage metric, the row is written with the next usage batch"""
+        await usage_buffer.put(dict(
             tenant_id=tenant_id,
             metric_name=metric_name,
             value=value,
             recorded_at=datetime.utcnow()
-        )
-        
-        self.db.add(usage)
-        await self.db.commit()
-        await self.db.refresh(usage)
-        
-        return usage
+        ))
     
     async def get_tenant_usage(self, tenant_id: int, metric_name: str, start_date: datetime, end_date: datetime) -> List[Usage]:
         """Get usage data for tenant"""
@@ -258,52 +447,63 @@ class BillingService:
         )
         return result.scalars().all()
     
-    # Statistics
-    async def get_billing_stats(self) -> BillingStatsResponse:
-        """Get billing statistics"""
-        # Total revenue
-        total_revenue_result = await self.db.execute(
-            select(func.sum(Payment.amount))
-            .where(Payment.status == 'completed')
-        )
-        total_revenue = total_revenue_result.scalar() or Decimal('0')
+    async def get_tenant_usage_bucketed(
+        self,
+        tenant_id: int,
+        metric_name: str,
+        start_date: datetime,
+        end_date: datetime,
+        bucket: str = "hour"
+    ) -> List[Tuple[datetime, int]]:
+        """Get usage for tenant summed per time bucket, aggregated in the database"""
+        if bucket not in USAGE_BUCKETS:
+            raise ValueError(f"Unsupported usage bucket: {bucket}")
         
-        # Monthly revenue
-        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_revenue_result = await self.db.execute(
-            select(func.sum(Payment.amount))
+        bucket_start = func.date_trunc(bucket, Usage.recorded_at).label('bucket')
+        result = await self.db.execute(
+            select(bucket_start, func.sum(Usage.value))
             .where(
-                Payment.status == 'completed',
-                Payment.created_at >= start_of_month
+                Usage.tenant_id == tenant_id,
+                Usage.metric_name == metric_name,
+                Usage.recorded_at >= start_date,
+                Usage.recorded_at <= end_date
             )
+            .group_by(bucket_start)
+            .order_by(bucket_start)
         )
-        monthly_revenue = monthly_revenue_result.scalar() or Decimal('0')
-        
-        # Active subscriptions
-        active_subs_result = await self.db.execute(
-            select(func.count(Subscription.id))
-            .where(Subscription.status.in_(['active', 'trialing']))
-        )
-        active_subscriptions = active_subs_result.scalar() or 0
+        return result.all()
+    
+    # Statistics
+    async def get_billing_stats(self) -> BillingStatsResponse:
+        """Get billing statistics"""
+        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        completed = Payment.status == PaymentStatus.COMPLETED
         
-        # Total customers
-        total_customers_result = await self.db.execute(
-            select(func.count(func.distinct(Subscription.tenant_id)))
+        # One conditional aggregate per table, the tables are queried concurrently
+        revenue, subscriptions = await asyncio.gather(
+            # Total and monthly revenue
+            self._one(select(
+                func.coalesce(func.sum(Payment.amount).filter(completed), 0),
+                func.coalesce(func.sum(Payment.amount).filter(completed, Payment.created_at >= start_of_month), 0)
+            )),
+            # Active subscriptions, customers and cancellations this month
+            self._one(select(
+                func.count().filter(Subscription.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING])),
+                func.count(func.distinct(Subscription.tenant_id)),
+                func.count().filter(
+                    Subscription.status == SubscriptionStatus.CANCELLED,
+                    Subscription.updated_at >= start_of_month
+                )
+            ).select_from(Subscription.__table__))
         )
-        total_customers = total_customers_result.scalar() or 0
+        total_revenue, monthly_revenue = revenue
+        active_subscriptions, total_customers, cancelled_this_month = subscriptions
         
         # Calculate ARPU and churn rate
         arpu = total_revenue / total_customers if total_customers > 0 else Decimal('0')
         
         # Simple churn rate calculation (cancelled this month / total customers)
-        cancelled_this_month = await self.db.execute(
-            select(func.count(Subscription.id))
-            .where(
-                Subscription.status == 'cancelled',
-                Subscription.updated_at >= start_of_month
-            )
-        )
-        churn_rate = (cancelled_this_month.scalar() or 0) / total_customers if total_customers > 0 else 0.0
+        churn_rate = cancelled_this_month / total_customers if total_customers > 0 else 0.0
         
         return BillingStatsResponse(
             total_revenue=total_revenue,
@@ -313,4 +513,3 @@ class BillingService:
             churn_rate=churn_rate,
             average_revenue_per_user=arpu
         )
-
@@ -1,19 +1,27 @@
 """
 Email service for user verification and password reset
 """
+import hashlib
+import logging
 import secrets
-import string
 from typing import Optional
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
+from fastapi import BackgroundTasks
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from jinja2 import Template
+from jinja2 import Environment
 
 from app.core.config import settings
 from app.models.user import User
 from app.core.security import get_password_hash
 
+logger = logging.getLogger(__name__)
+
+def hash_token(token: str) -> str:
+    """Digest stored in place of an emailed token, lookups compare digests"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
 # Email configuration
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.SMTP_USER,
@@ -28,6 +36,9 @@ conf = ConnectionConfig(
     VALIDATE_CERTS=True
 )
 
+# Shared mail client, services use it instead of building one per request
+fastmail = FastMail(conf)
+
 # Email templates
 EMAIL_VERIFICATION_TEMPLATE = """
 <!DOCTYPE html>
@@ -65,30 +76,84 @@ PASSWORD_RESET_TEMPLATE = """
 </html>
 """
 
+WELCOME_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Welcome to {{ app_name }}</title>
+</head>
+<body>
+    <h2>Welcome to {{ app_name }}!</h2>
+    <p>Hello {{ user_name }},</p>
+    <p>Your account has been successfully created. You can now start using our Odoo SaaS platform.</p>
+    <p><a href="https://your-domain.com/dashboard" style="background-color: #28a745; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Go to Dashboard</a></p>
+    <p>If you have any questions, feel free to contact our support team.</p>
+    <p>Best regards,<br>{{ app_name }} Team</p>
+</body>
+</html>
+"""
+
+INSTANCE_READY_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Your Odoo Instance is Ready - {{ app_name }}</title>
+</head>
+<body>
+    <h2>Your Odoo Instance is Ready!</h2>
+    <p>Hello {{ user_name }},</p>
+    <p>Your Odoo instance "{{ instance_name }}" has been successfully created and is now ready to use.</p>
+    <p><strong>Instance URL:</strong> <a href="{{ instance_url }}">{{ instance_url }}</a></p>
+    <p>You can now access your Odoo instance and start configuring your business applications.</p>
+    <p>Best regards,<br>{{ app_name }} Team</p>
+</body>
+</html>
+"""
+
+# Templates are compiled once at import, renders only run the compiled code
+_jinja_env = Environment(auto_reload=False)
+EMAIL_VERIFICATION_TMPL = _jinja_env.from_string(EMAIL_VERIFICATION_TEMPLATE)
+PASSWORD_RESET_TMPL = _jinja_env.from_string(PASSWORD_RESET_TEMPLATE)
+WELCOME_TMPL = _jinja_env.from_string(WELCOME_TEMPLATE)
+INSTANCE_READY_TMPL = _jinja_env.from_string(INSTANCE_READY_TEMPLATE)
+
 class EmailService:
     """Service for email operations"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.fastmail = FastMail(conf)
+        self.fastmail = fastmail
     
     def generate_token(self, length: int = 32) -> str:
-        """Generate secure random token"""
-        alphabet = string.ascii_letters + string.digits
-        return ''.join(secrets.choice(alphabet) for _ in range(length))
+        """Generate secure random token of about length URL-safe characters"""
+        return secrets.token_urlsafe(max(1, length * 3 // 4))
     
-    async def send_verification_email(self, user: User) -> bool:
+    async def _deliver(self, message: MessageSchema):
+        """Send a message, failures are reported rather than raised"""
+        try:
+            await self.fastmail.send_message(message)
+        except Exception:
+            logger.exception(f"Failed to send email '{message.subject}'")
+    
+    async def _send(self, message: MessageSchema, background_tasks: Optional[BackgroundTasks]):
+        """Send a message after the response when background tasks are given, otherwise now"""
+        if background_tasks is not None:
+            background_tasks.add_task(self._deliver, message)
+        else:
+            await self.fastmail.send_message(message)
+    
+    async def send_verification_email(self, user: User, background_tasks: Optional[BackgroundTasks] = None) -> bool:
         """Send email verification to user"""
         try:
             # Generate verification token
             verification_token = self.generate_token()
             
-            # Store token in user record (you might want a separate table for tokens)
+            # Store the token digest in user record (you might want a separate table for tokens)
             await self.db.execute(
                 update(User)
                 .where(User.id == user.id)
                 .values(
-                    verification_token=verification_token,
+                    verification_token=hash_token(verification_token),
                     verification_token_expires=datetime.utcnow() + timedelta(hours=24)
                 )
             )
@@ -98,8 +163,7 @@ class EmailService:
             verification_url = f"https://your-domain.com/verify-email?token={verification_token}"
             
             # Render email template
-            template = Template(EMAIL_VERIFICATION_TEMPLATE)
-            html_content = template.render(
+            html_content = EMAIL_VERIFICATION_TMPL.render(
                 app_name=settings.APP_NAME,
                 user_name=user.full_name or user.email,
                 verification_url=verification_url
@@ -113,11 +177,11 @@ class EmailService:
                 subtype="html"
             )
             
-            await self.fastmail.send_message(message)
+            await self._send(message, background_tasks)
             return True
             
-        except Exception as e:
-            print(f"Failed to send verification email: {e}")
+        except Exception:
+            logger.exception(f"Failed to send verification email to user {user.id}")
             return False
     
     async def verify_email(self, token: str) -> bool:
@@ -126,7 +190,7 @@ class EmailService:
             # Find user with token
             result = await self.db.execute(
                 select(User).where(
-                    User.verification_token == token,
+                    User.verification_token == hash_token(token),
                     User.verification_token_expires > datetime.utcnow()
                 )
             )
@@ -149,11 +213,11 @@ class EmailService:
             
             return True
             
-        except Exception as e:
-            print(f"Failed to verify email: {e}")
+        except Exception:
+            logger.exception("Failed to verify email")
             return False
     
-    async def send_password_reset_email(self, email: str) -> bool:
+    async def send_password_reset_email(self, email: str, background_tasks: Optional[BackgroundTasks] = None) -> bool:
         """Send password reset email"""
         try:
             # Find user by email
@@ -169,12 +233,12 @@ class EmailService:
             # Generate reset token
             reset_token = self.generate_token()
             
-            # Store token in user record
+            # Store the token digest in user record
             await self.db.execute(
                 update(User)
                 .where(User.id == user.id)
                 .values(
-                    reset_token=reset_token,
+                    reset_token=hash_token(reset_token),
                     reset_token_expires=datetime.utcnow() + timedelta(hours=1)
                 )
             )
@@ -184,8 +248,7 @@ class EmailService:
             reset_url = f"https://your-domain.com/reset-password?token={reset_token}"
             
             # Render email template
-            template = Template(PASSWORD_RESET_TEMPLATE)
-            html_content = template.render(
+            html_content = PASSWORD_RESET_TMPL.render(
                 app_name=settings.APP_NAME,
                 user_name=user.full_name or user.email,
                 reset_url=reset_url
@@ -199,11 +262,11 @@ class EmailService:
                 subtype="html"
             )
             
-            await self.fastmail.send_message(message)
+            await self._send(message, background_tasks)
             return True
             
-        except Exception as e:
-            print(f"Failed to send password reset email: {e}")
+        except Exception:
+            logger.exception("Failed to send password reset email")
             return False
     
     async def reset_password(self, token: str, new_password: str) -> bool:
@@ -212,7 +275,7 @@ class EmailService:
             # Find user with token
             result = await self.db.execute(
                 select(User).where(
-                    User.reset_token == token,
+                    User.reset_token == hash_token(token),
                     User.reset_token_expires > datetime.utcnow()
                 )
             )
@@ -235,32 +298,14 @@ class EmailService:
             
             return True
             
-        except Exception as e:
-            print(f"Failed to reset password: {e}")
+        except Exception:
+            logger.exception("Failed to reset password")
             return False
     
-    async def send_welcome_email(self, user: User) -> bool:
+    async def send_welcome_email(self, user: User, background_tasks: Optional[BackgroundTasks] = None) -> bool:
         """Send welcome email to new user"""
         try:
-            welcome_template = """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Welcome to {{ app_name }}</title>
-            </head>
-            <body>
-                <h2>Welcome to {{ app_name }}!</h2>
-                <p>Hello {{ user_name }},</p>
-                <p>Your account has been successfully created. You can now start using our Odoo SaaS platform.</p>
-                <p><a href="https://your-domain.com/dashboard" style="background-color: #28a745; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Go to Dashboard</a></p>
-                <p>If you have any questions, feel free to contact our support team.</p>
-                <p>Best regards,<br>{{ app_name }} Team</p>
-            </body>
-            </html>
-            """
-            
-            template = Template(welcome_template)
-            html_content = template.render(
+            html_content = WELCOME_TMPL.render(
                 app_name=settings.APP_NAME,
                 user_name=user.full_name or user.email
             )
@@ -272,35 +317,23 @@ class EmailService:
                 subtype="html"
             )
             
-            await self.fastmail.send_message(message)
+            await self._send(message, background_tasks)
             return True
             
-        except Exception as e:
-            print(f"Failed to send welcome email: {e}")
+        except Exception:
+            logger.exception(f"Failed to send welcome email to user {user.id}")
             return False
     
-    async def send_instance_ready_email(self, user: User, instance_name: str, instance_url: str) -> bool:
+    async def send_instance_ready_email(
+        self,
+        user: User,
+        instance_name: str,
+        instance_url: str,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> bool:
         """Send notification when Odoo instance is ready"""
         try:
-            instance_template = """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Your Odoo Instance is Ready - {{ app_name }}</title>
-            </head>
-            <body>
-                <h2>Your Odoo Instance is Ready!</h2>
-                <p>Hello {{ user_name }},</p>
-                <p>Your Odoo instance "{{ instance_name }}" has been successfully created and is now ready to use.</p>
-                <p><strong>Instance URL:</strong> <a href="{{ instance_url }}">{{ instance_url }}</a></p>
-                <p>You can now access your Odoo instance and start configuring your business applications.</p>
-                <p>Best regards,<br>{{ app_name }} Team</p>
-            </body>
-            </html>
-            """
-            
-            template = Template(instance_template)
-            html_content = template.render(
+            html_content = INSTANCE_READY_TMPL.render(
                 app_name=settings.APP_NAME,
                 user_name=user.full_name or user.email,
                 instance_name=instance_name,
@@ -314,10 +347,10 @@ class EmailService:
                 subtype="html"
             )
             
-            await self.fastmail.send_message(message)
+            await self._send(message, background_tasks)
             return True
             
-        except Exception as e:
-            print(f"Failed to send instance ready email: {e}")
+        except Exception:
+            logger.exception(f"Failed to send instance ready email to user {user.id}")
             return False
 
@@ -3,21 +3,28 @@ Monitoring service for system health and performance tracking
 """
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
-from typing import Dict, List, Optional, Any
+from sqlalchemy.orm import joinedload
+from typing import Dict, List, Optional, Any, Tuple, Awaitable, Callable
 from datetime import datetime, timedelta
 import psutil
 import docker
 import asyncio
 import logging
+from contextlib import suppress
 from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest
 import json
+import orjson
 import os
+import threading
+import time
 
-from app.models.tenant import Tenant
-from app.models.odoo_instance import OdooInstance
+from app.models.tenant import Tenant, TenantStatus
+from app.models.odoo_instance import OdooInstance, InstanceStatus
 from app.models.audit_log import AuditLog
-from app.models.billing import Subscription, Payment
+from app.models.billing import Subscription, Payment, SubscriptionStatus, PaymentStatus
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.odoo_manager import docker_client
 
 # Prometheus metrics
 REGISTRY = CollectorRegistry()
@@ -37,40 +44,176 @@ API_REQUEST_DURATION = Histogram('api_request_duration_seconds', 'API request du
 MONTHLY_REVENUE = Gauge('monthly_revenue_usd', 'Monthly revenue in USD', registry=REGISTRY)
 ACTIVE_SUBSCRIPTIONS = Gauge('active_subscriptions_total', 'Total active subscriptions', registry=REGISTRY)
 
+# Labelled children of the request metrics, resolved once per label set. The
+# registry keeps every child anyway, this only skips the label lookup
+_api_request_children: Dict[Tuple[str, str, int], Tuple[Any, Any]] = {}
+
 logger = logging.getLogger(__name__)
 
+# Host samples are shared for SYSTEM_SAMPLE_TTL seconds, so the health and alert
+# checks of one dashboard refresh read the same numbers instead of each blocking
+SYSTEM_SAMPLE_TTL = 1.0
+_system_sample: Dict[str, Any] = {"ts": float("-inf"), "cpu": 0.0, "memory": None, "disk": None}
+
+# cpu_percent(interval=None) reports usage since the previous call, this sets the baseline
+psutil.cpu_percent(interval=None)
+
+def _read_system() -> Tuple[float, Any, Any]:
+    return psutil.cpu_percent(interval=None), psutil.virtual_memory(), psutil.disk_usage('/')
+
+async def sample_system() -> Tuple[float, Any, Any]:
+    """CPU percent, virtual memory and root disk usage, resampled at most once per TTL"""
+    now = time.monotonic()
+    if now - _system_sample["ts"] >= SYSTEM_SAMPLE_TTL:
+        # The reads are syscalls that can stall (a slow disk mount), keep them
+        # off the event loop
+        cpu, memory, disk = await asyncio.to_thread(_read_system)
+        _system_sample.update(ts=now, cpu=cpu, memory=memory, disk=disk)
+    return _system_sample["cpu"], _system_sample["memory"], _system_sample["disk"]
+
+def _publish_app_gauges(active_tenants: int, running_instances: int, active_subscriptions: int, monthly_revenue: float):
+    """Publish one aggregated application metrics row to the gauges"""
+    ACTIVE_TENANTS.set(active_tenants)
+    RUNNING_INSTANCES.set(running_instances)
+    ACTIVE_SUBSCRIPTIONS.set(active_subscriptions)
+    MONTHLY_REVENUE.set(monthly_revenue)
+
+# Upper bound for each dependency check of the health endpoint, in seconds
+HEALTH_CHECK_TIMEOUT = 2.0
+
+# The exposition is serialized once per scrape interval, concurrent scrapers
+# share the cached bytes
+PROMETHEUS_CACHE_TTL = 5.0
+_prometheus_cache: Dict[str, Any] = {"ts": float("-inf"), "body": b""}
+_prometheus_lock = asyncio.Lock()
+
+# Container stats are followed through Docker's streaming endpoint in the
+# background, instance metrics read the latest sample. The container list is
+# rescanned every CONTAINER_STATS_INTERVAL seconds to pick up starts and stops
+CONTAINER_STATS_INTERVAL = 5.0
+
+class ContainerStatsSampler:
+    """Keeps the latest stats of each running Odoo container of the platform"""
+    
+    def __init__(self, interval: float = CONTAINER_STATS_INTERVAL):
+        self.interval = interval
+        # Container id -> (container status, raw stats)
+        self.samples: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._client = None
+        self._task: Optional[asyncio.Task] = None
+        # Container id -> stop flag of the thread following its stream
+        self._followers: Dict[str, threading.Event] = {}
+    
+    def start(self):
+        """Start sampling, called from the application lifespan"""
+        if self._task is not None:
+            return
+        try:
+            self._client = docker.from_env()
+        except Exception as e:
+            logger.warning(f"Container stats sampling disabled, Docker not available: {e}")
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for stop in self._followers.values():
+            stop.set()
+        self._followers.clear()
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Container stats refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+    
+    async def refresh(self):
+        """Follow newly started containers and stop following the ones that went away"""
+        containers = await asyncio.to_thread(
+            self._client.containers.list,
+            filters={"label": "managed.by=odoo-saas-platform", "status": "running"}
+        )
+        running = {container.id: container for container in containers}
+        
+        for container_id in list(self._followers):
+            if container_id not in running:
+                self._followers.pop(container_id).set()
+                self.samples.pop(container_id, None)
+        
+        for container_id, container in running.items():
+            if container_id not in self._followers:
+                stop = threading.Event()
+                self._followers[container_id] = stop
+                # Streams stay open for the container's lifetime, so each gets its own
+                # thread rather than holding a slot of the shared to_thread pool
+                threading.Thread(
+                    target=self._follow,
+                    args=(container, stop),
+                    name=f"stats-{container.name}",
+                    daemon=True
+                ).start()
+    
+    def _follow(self, container, stop: threading.Event):
+        """Consume one container's stats stream, runs in its own thread"""
+        try:
+            # Raw chunks are split on the newline Docker ends each document with
+            # and only the newest complete one is parsed, with orjson instead of
+            # docker-py's stdlib json decoding
+            stream = self._client.api.stats(container.id, stream=True, decode=False)
+            try:
+                pending = b""
+                for chunk in stream:
+                    if stop.is_set():
+                        break
+                    *documents, pending = (pending + chunk).split(b"\n")
+                    latest = next((doc for doc in reversed(documents) if doc.strip()), None)
+                    if latest is not None:
+                        self.samples[container.id] = (container.status, orjson.loads(latest))
+            finally:
+                stream.close()
+        except Exception as e:
+            logger.warning(f"Stats stream for {container.name} ended: {e}")
+        
+        # A stream that ended on its own is reopened by the next refresh
+        if self._followers.get(container.id) is stop:
+            del self._followers[container.id]
+
+container_stats = ContainerStatsSampler()
+
 class MonitoringService:
     """Service for monitoring system health and performance"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.docker_client = None
-        try:
-            self.docker_client = docker.from_env()
-        except Exception as e:
-            logger.warning(f"Docker client not available: {e}")
+        # Shared with the instance manager instead of connecting per request
+        self.docker_client = docker_client
     
     async def get_system_health(self) -> Dict[str, Any]:
         """Get overall system health status"""
         try:
             # System metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            cpu_percent, memory, disk = await sample_system()
             
             # Update Prometheus metrics
             SYSTEM_CPU_USAGE.set(cpu_percent)
             SYSTEM_MEMORY_USAGE.set(memory.percent)
             SYSTEM_DISK_USAGE.set(disk.percent)
             
-            # Database health
-            db_health = await self._check_database_health()
-            
-            # Docker health
-            docker_health = await self._check_docker_health()
-            
-            # Application metrics
-            app_metrics = await self._get_application_metrics()
+            # Database health, Docker health and application metrics run
+            # concurrently, each bounded so a hung dependency cannot hold up the
+            # endpoint. A session cannot run statements concurrently, so the
+            # database checks get sessions of their own
+            db_health, docker_health, app_metrics = await asyncio.gather(
+                self._bounded(self._in_own_session(self._check_database_health)),
+                self._bounded(self._check_docker_health()),
+                self._bounded(self._in_own_session(self._get_application_metrics))
+            )
             
             # Determine overall health status
             health_status = "healthy"
@@ -103,20 +246,36 @@ class MonitoringService:
                 "error": str(e)
             }
     
-    async def _check_database_health(self) -> Dict[str, Any]:
+    async def _bounded(self, check: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Await a health check, reporting a timeout instead of waiting on it"""
+        try:
+            return await asyncio.wait_for(check, HEALTH_CHECK_TIMEOUT)
+        except asyncio.TimeoutError:
+            return {
+                "status": "timeout",
+                "error": f"No response within {HEALTH_CHECK_TIMEOUT}s"
+            }
+    
+    async def _in_own_session(self, check: Callable[[AsyncSession], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run a database check on a dedicated session"""
+        async with AsyncSessionLocal() as db:
+            return await check(db)
+    
+    async def _check_database_health(self, db: Optional[AsyncSession] = None) -> Dict[str, Any]:
         """Check database connectivity and performance"""
+        db = db or self.db
         try:
-            start_time = datetime.utcnow()
+            start = time.perf_counter()
             
             # Simple query to test connectivity
-            result = await self.db.execute(select(func.count()).select_from(Tenant))
+            result = await db.execute(select(func.count()).select_from(Tenant))
             tenant_count = result.scalar()
             
-            response_time = (datetime.utcnow() - start_time).total_seconds()
+            response_time_ms = (time.perf_counter() - start) * 1000.0
             
             return {
                 "status": "healthy",
-                "response_time_ms": response_time * 1000,
+                "response_time_ms": response_time_ms,
                 "tenant_count": tenant_count
             }
             
@@ -137,15 +296,20 @@ class MonitoringService:
         
         try:
             # Check Docker daemon
-            self.docker_client.ping()
+            api = self.docker_client.api
+            await asyncio.to_thread(api.ping)
             
-            # Get container stats
-            containers = self.docker_client.containers.list()
-            running_containers = len([c for c in containers if c.status == 'running'])
+            # Get container stats, the low-level listing returns plain dicts
+            # instead of building a Container object per entry
+            containers = await asyncio.to_thread(api.containers)
+            running_containers = sum(1 for c in containers if c['State'] == 'running')
             
             # Get Odoo containers specifically
-            odoo_containers = [c for c in containers if 'odoo' in c.name.lower()]
-            running_odoo = len([c for c in odoo_containers if c.status == 'running'])
+            odoo_containers = [
+                c for c in containers
+                if any('odoo' in name.lower() for name in c['Names'])
+            ]
+            running_odoo = sum(1 for c in odoo_containers if c['State'] == 'running')
             
             return {
                 "status": "healthy",
@@ -162,46 +326,38 @@ class MonitoringService:
                 "error": str(e)
             }
     
-    async def _get_application_metrics(self) -> Dict[str, Any]:
+    async def _get_application_metrics(self, db: Optional[AsyncSession] = None) -> Dict[str, Any]:
         """Get application-specific metrics"""
+        db = db or self.db
         try:
-            # Active tenants
-            active_tenants_result = await self.db.execute(
-                select(func.count(Tenant.id)).where(Tenant.status == 'active')
-            )
-            active_tenants = active_tenants_result.scalar() or 0
-            
-            # Running instances
-            running_instances_result = await self.db.execute(
-                select(func.count(OdooInstance.id)).where(OdooInstance.status == 'running')
-            )
-            running_instances = running_instances_result.scalar() or 0
-            
-            # Active subscriptions
-            active_subs_result = await self.db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.status.in_(['active', 'trialing'])
-                )
-            )
-            active_subscriptions = active_subs_result.scalar() or 0
-            
-            # Monthly revenue
             start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            monthly_revenue_result = await self.db.execute(
-                select(func.sum(Payment.amount)).where(
+            
+            # All counters as scalar subqueries of a single statement, one round trip
+            result = await db.execute(select(
+                # Active tenants
+                select(func.count()).select_from(Tenant.__table__)
+                .where(Tenant.status == TenantStatus.ACTIVE).scalar_subquery(),
+                # Running instances
+                select(func.count()).select_from(OdooInstance.__table__)
+                .where(OdooInstance.status == InstanceStatus.RUNNING).scalar_subquery(),
+                # Active subscriptions
+                select(func.count()).select_from(Subscription.__table__)
+                .where(Subscription.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING]))
+                .scalar_subquery(),
+                # Monthly revenue
+                select(func.coalesce(func.sum(Payment.amount), 0))
+                .where(
                     and_(
-                        Payment.status == 'completed',
+                        Payment.status == PaymentStatus.COMPLETED,
                         Payment.created_at >= start_of_month
                     )
-                )
-            )
-            monthly_revenue = float(monthly_revenue_result.scalar() or 0)
+                ).scalar_subquery()
+            ))
+            active_tenants, running_instances, active_subscriptions, monthly_revenue = result.one()
+            monthly_revenue = float(monthly_revenue)
             
             # Update Prometheus metrics
-            ACTIVE_TENANTS.set(active_tenants)
-            RUNNING_INSTANCES.set(running_instances)
-            ACTIVE_SUBSCRIPTIONS.set(active_subscriptions)
-            MONTHLY_REVENUE.set(monthly_revenue)
+            _publish_app_gauges(active_tenants, running_instances, active_subscriptions, monthly_revenue)
             
             return {
                 "active_tenants": active_tenants,
@@ -240,8 +396,14 @@ class MonitoringService:
             # Get container metrics if Docker is available
             if self.docker_client and instance.container_id:
                 try:
-                    container = self.docker_client.containers.get(instance.container_id)
-                    stats = container.stats(stream=False)
+                    sample = container_stats.samples.get(instance.container_id)
+                    if sample:
+                        container_status, stats = sample
+                    else:
+                        # Not sampled yet, e.g. a container started since the last poll
+                        container = await asyncio.to_thread(self.docker_client.containers.get, instance.container_id)
+                        container_status = container.status
+                        stats = await asyncio.to_thread(container.stats, stream=False)
                     
                     # Calculate CPU usage
                     cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - \
@@ -256,7 +418,7 @@ class MonitoringService:
                     memory_percent = (memory_usage / memory_limit) * 100.0 if memory_limit > 0 else 0.0
                     
                     metrics.update({
-                        "container_status": container.status,
+                        "container_status": container_status,
                         "cpu_percent": cpu_percent,
                         "memory_usage_mb": memory_usage / (1024**2),
                         "memory_limit_mb": memory_limit / (1024**2),
@@ -278,43 +440,41 @@ class MonitoringService:
     async def get_tenant_metrics(self, tenant_id: int) -> Dict[str, Any]:
         """Get comprehensive metrics for a tenant"""
         try:
-            # Get tenant info
-            tenant_result = await self.db.execute(
-                select(Tenant).where(Tenant.id == tenant_id)
+            # Tenant, its instance counts and its live subscription in one round
+            # trip. A tenant has at most one live subscription, so the join
+            # cannot multiply rows
+            result = await self.db.execute(
+                select(
+                    Tenant,
+                    select(func.count()).select_from(OdooInstance.__table__)
+                    .where(OdooInstance.tenant_id == Tenant.id).scalar_subquery(),
+                    select(func.count()).select_from(OdooInstance.__table__)
+                    .where(
+                        OdooInstance.tenant_id == Tenant.id,
+                        OdooInstance.status == InstanceStatus.RUNNING
+                    ).scalar_subquery()
+                )
+                .options(joinedload(Tenant.subscriptions.and_(
+                    Subscription.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING])
+                )))
+                .where(Tenant.id == tenant_id)
             )
-            tenant = tenant_result.scalar_one_or_none()
+            row = result.unique().first()
             
-            if not tenant:
+            if not row:
                 return {"error": "Tenant not found"}
             
-            # Get tenant instances
-            instances_result = await self.db.execute(
-                select(OdooInstance).where(OdooInstance.tenant_id == tenant_id)
-            )
-            instances = instances_result.scalars().all()
+            tenant, total_instances, running_instances = row
+            subscription = tenant.subscriptions[0] if tenant.subscriptions else None
             
-            # Get subscription info
-            subscription_result = await self.db.execute(
-                select(Subscription).where(
-                    and_(
-                        Subscription.tenant_id == tenant_id,
-                        Subscription.status.in_(['active', 'trialing'])
-                    )
-                ).order_by(Subscription.created_at.desc())
-            )
-            subscription = subscription_result.scalar_one_or_none()
-            
-            # Calculate usage metrics
-            total_instances = len(instances)
-            running_instances = len([i for i in instances if i.status == 'running'])
-            
-            # Get recent audit logs
+            # Get recent audit logs, only the columns that are returned
             audit_logs_result = await self.db.execute(
-                select(AuditLog).where(
-                    AuditLog.tenant_id == tenant_id
+                select(AuditLog.action, AuditLog.details, AuditLog.created_at).where(
+                    AuditLog.resource_type == "tenant",
+                    AuditLog.resource_id_int == tenant_id
                 ).order_by(AuditLog.created_at.desc()).limit(10)
             )
-            recent_activities = audit_logs_result.scalars().all()
+            recent_activities = audit_logs_result.all()
             
             return {
                 "tenant_id": tenant_id,
@@ -332,18 +492,17 @@ class MonitoringService:
                     "current_period_end": subscription.current_period_end if subscription else None
                 },
                 "usage": {
-                    "user_count": tenant.user_count,
                     "max_users": tenant.max_users,
-                    "storage_used": tenant.storage_used,
-                    "storage_limit": tenant.storage_limit
+                    "storage_used": tenant.storage_used_gb,
+                    "storage_limit": tenant.storage_limit_gb
                 },
                 "recent_activities": [
                     {
-                        "action": log.action,
-                        "details": log.details,
-                        "created_at": log.created_at
+                        "action": action,
+                        "details": details,
+                        "created_at": created_at
                     }
-                    for log in recent_activities
+                    for action, details, created_at in recent_activities
                 ]
             }
             
@@ -356,36 +515,24 @@ class MonitoringService:
         try:
             start_time = datetime.utcnow() - timedelta(hours=hours)
             
-            # Get audit logs for activity tracking
-            audit_logs_result = await self.db.execute(
-                select(AuditLog).where(
-                    AuditLog.created_at >= start_time
-                ).order_by(AuditLog.created_at)
-            )
-            audit_logs = audit_logs_result.scalars().all()
-            
-            # Group activities by hour
-            hourly_activity = {}
-            for log in audit_logs:
-                hour_key = log.created_at.strftime("%Y-%m-%d %H:00")
-                if hour_key not in hourly_activity:
-                    hourly_activity[hour_key] = 0
-                hourly_activity[hour_key] += 1
-            
-            # Get instance creation/deletion trends
-            instances_result = await self.db.execute(
-                select(OdooInstance).where(
-                    OdooInstance.created_at >= start_time
-                )
-            )
-            new_instances = instances_result.scalars().all()
-            
-            hourly_instances = {}
-            for instance in new_instances:
-                hour_key = instance.created_at.strftime("%Y-%m-%d %H:00")
-                if hour_key not in hourly_instances:
-                    hourly_instances[hour_key] = 0
-                hourly_instances[hour_key] += 1
+            # Activity and new instances per hour, bucketed in the database
+            activity_hour = func.date_trunc('hour', AuditLog.created_at).label('hour')
+            instance_hour = func.date_trunc('hour', OdooInstance.created_at).label('hour')
+            activity_rows = (await self.db.execute(
+                select(activity_hour, func.count())
+                .where(AuditLog.created_at >= start_time)
+                .group_by(activity_hour)
+                .order_by(activity_hour)
+            )).all()
+            instance_rows = (await self.db.execute(
+                select(instance_hour, func.count())
+                .where(OdooInstance.created_at >= start_time)
+                .group_by(instance_hour)
+                .order_by(instance_hour)
+            )).all()
+            
+            hourly_activity = {hour.strftime("%Y-%m-%d %H:00"): count for hour, count in activity_rows}
+            hourly_instances = {hour.strftime("%Y-%m-%d %H:00"): count for hour, count in instance_rows}
             
             return {
                 "period_hours": hours,
@@ -393,8 +540,8 @@ class MonitoringService:
                 "end_time": datetime.utcnow(),
                 "activity_by_hour": hourly_activity,
                 "new_instances_by_hour": hourly_instances,
-                "total_activities": len(audit_logs),
-                "total_new_instances": len(new_instances)
+                "total_activities": sum(hourly_activity.values()),
+                "total_new_instances": sum(hourly_instances.values())
             }
             
         except Exception as e:
@@ -407,9 +554,7 @@ class MonitoringService:
         
         try:
             # System resource alerts
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            cpu_percent, memory, disk = await sample_system()
             
             if cpu_percent > 90:
                 alerts.append({
@@ -450,13 +595,22 @@ class MonitoringService:
                     "timestamp": datetime.utcnow()
                 })
             
-            # Application alerts
-            # Check for failed instances
-            failed_instances_result = await self.db.execute(
-                select(func.count(OdooInstance.id)).where(OdooInstance.status == 'error')
-            )
-            failed_instances = failed_instances_result.scalar() or 0
+            # Application alerts, failed instances and overdue payments in one round
+            # trip. Both counts are served by partial indexes over the few matching rows
+            result = await self.db.execute(select(
+                select(func.count()).select_from(OdooInstance.__table__)
+                .where(OdooInstance.status == InstanceStatus.ERROR).scalar_subquery(),
+                select(func.count()).select_from(Payment.__table__)
+                .where(
+                    and_(
+                        Payment.status == PaymentStatus.PENDING,
+                        Payment.created_at < datetime.utcnow() - timedelta(days=7)
+                    )
+                ).scalar_subquery()
+            ))
+            failed_instances, overdue_payments = result.one()
             
+            # Check for failed instances
             if failed_instances > 0:
                 alerts.append({
                     "type": "warning",
@@ -467,16 +621,6 @@ class MonitoringService:
                 })
             
             # Check for overdue payments
-            overdue_payments_result = await self.db.execute(
-                select(func.count(Payment.id)).where(
-                    and_(
-                        Payment.status == 'pending',
-                        Payment.created_at < datetime.utcnow() - timedelta(days=7)
-                    )
-                )
-            )
-            overdue_payments = overdue_payments_result.scalar() or 0
-            
             if overdue_payments > 0:
                 alerts.append({
                     "type": "warning",
@@ -497,12 +641,32 @@ class MonitoringService:
         
         return alerts
     
-    def get_prometheus_metrics(self) -> str:
-        """Get Prometheus metrics in text format"""
-        return generate_latest(REGISTRY).decode('utf-8')
+    async def get_prometheus_metrics(self) -> bytes:
+        """Get Prometheus metrics in text format, regenerated at most once per TTL"""
+        async with _prometheus_lock:
+            now = time.monotonic()
+            if now - _prometheus_cache["ts"] >= PROMETHEUS_CACHE_TTL:
+                # Refresh the gauges together with the exposition
+                cpu_percent, memory, disk = await sample_system()
+                SYSTEM_CPU_USAGE.set(cpu_percent)
+                SYSTEM_MEMORY_USAGE.set(memory.percent)
+                SYSTEM_DISK_USAGE.set(disk.percent)
+                await self._get_application_metrics()
+                
+                _prometheus_cache.update(ts=now, body=generate_latest(REGISTRY))
+            return _prometheus_cache["body"]
     
     async def record_api_request(self, method: str, endpoint: str, status_code: int, duration: float):
         """Record API request metrics"""
-        API_REQUESTS.labels(method=method, endpoint=endpoint, status=str(status_code)).inc()
-        API_REQUEST_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
+        key = (method, endpoint, status_code)
+        children = _api_request_children.get(key)
+        if children is None:
+            children = (
+                API_REQUESTS.labels(method, endpoint, str(status_code)),
+                API_REQUEST_DURATION.labels(method, endpoint)
+            )
+            _api_request_children[key] = children
+        
+        children[0].inc()
+        children[1].observe(duration)
 
@@ -10,15 +10,16 @@ import json
 import time
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, false
 from typing import Optional, Dict, Any, List
 import secrets
 import string
+from contextlib import asynccontextmanager
 
 from app.core.database import AsyncSessionLocal
 from app.core.config import settings
 from app.models.tenant import Tenant
-from app.models.odoo_instance import OdooInstance, InstanceStatus
+from app.models.odoo_instance import OdooInstance, InstanceStatus, InstancePort
 
 logger = logging.getLogger(__name__)
 
@@ -36,18 +37,46 @@ def generate_password(length: int = 12) -> str:
     alphabet = string.ascii_letters + string.digits
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
-async def get_next_available_port() -> int:
-    """Get next available port for Odoo instance"""
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(
-            select(OdooInstance.port).order_by(OdooInstance.port.desc()).limit(1)
-        )
-        last_port = result.scalar_one_or_none()
-        
-        if last_port:
-            return last_port + 1
-        else:
-            return 8070  # Start from 8070 (8069 is default Odoo port)
+async def get_next_available_port(db: AsyncSession) -> int:
+    """Claim the lowest free port for an Odoo instance"""
+    # Concurrent creates skip each other's locked rows instead of queueing,
+    # the claim is released again if the surrounding transaction rolls back
+    free_port = (
+        select(InstancePort.port)
+        .where(InstancePort.used == false())
+        .order_by(InstancePort.port)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(InstancePort)
+        .where(InstancePort.port == free_port)
+        .values(used=True)
+        .returning(InstancePort.port)
+    )
+    port = result.scalar_one_or_none()
+    
+    if port is None:
+        raise ValueError("No free ports left for Odoo instances")
+    return port
+
+async def release_port(db: AsyncSession, port: int) -> None:
+    """Return a port to the pool"""
+    await db.execute(
+        update(InstancePort)
+        .where(InstancePort.port == port)
+        .values(used=False)
+    )
+
+@asynccontextmanager
+async def _session(db: Optional[AsyncSession]):
+    """Reuse the caller's session, or open a short-lived one"""
+    if db is not None:
+        yield db
+    else:
+        async with AsyncSessionLocal() as session:
+            yield session
 
 class OdooInstanceManager:
     """Manager for Odoo instance operations"""
@@ -81,7 +110,7 @@ class OdooInstanceManager:
                 
                 # Generate instance details
                 container_name = f"odoo-{tenant_id}-{instance_name.lower().replace(' ', '-')}"
-                port = await get_next_available_port()
+                port = await get_next_available_port(db)
                 admin_pwd = admin_password or generate_password()
                 db_name = database_name or f"odoo_{tenant_id}_{int(time.time())}"
                 
@@ -182,7 +211,8 @@ class OdooInstanceManager:
             }
             
             # Create and start container
-            container = self.docker_client.containers.run(
+            container = await asyncio.to_thread(
+                self.docker_client.containers.run,
                 image=f"odoo:{odoo_version}",
                 name=container_name,
                 environment=environment,
@@ -205,12 +235,12 @@ class OdooInstanceManager:
             logger.error(f"Error creating Docker container: {e}")
             return None
     
-    async def start_instance(self, instance_id: int) -> bool:
+    async def start_instance(self, instance_id: int, db: Optional[AsyncSession] = None) -> bool:
         """Start Odoo instance"""
         if not self.docker_client:
             return False
         
-        async with AsyncSessionLocal() as db:
+        async with _session(db) as db:
             try:
                 # Get instance
                 result = await db.execute(select(OdooInstance).where(OdooInstance.id == instance_id))
@@ -220,8 +250,8 @@ class OdooInstanceManager:
                     return False
                 
                 # Start container
-                container = self.docker_client.containers.get(instance.container_id)
-                container.start()
+                container = await asyncio.to_thread(self.docker_client.containers.get, instance.container_id)
+                await asyncio.to_thread(container.start)
                 
                 # Update instance status
                 await db.execute(
@@ -241,12 +271,12 @@ class OdooInstanceManager:
                 logger.error(f"Error starting instance {instance_id}: {e}")
                 return False
     
-    async def stop_instance(self, instance_id: int) -> bool:
+    async def stop_instance(self, instance_id: int, db: Optional[AsyncSession] = None) -> bool:
         """Stop Odoo instance"""
         if not self.docker_client:
             return False
         
-        async with AsyncSessionLocal() as db:
+        async with _session(db) as db:
             try:
                 # Get instance
                 result = await db.execute(select(OdooInstance).where(OdooInstance.id == instance_id))
@@ -256,8 +286,8 @@ class OdooInstanceManager:
                     return False
                 
                 # Stop container
-                container = self.docker_client.containers.get(instance.container_id)
-                container.stop()
+                container = await asyncio.to_thread(self.docker_client.containers.get, instance.container_id)
+                await asyncio.to_thread(container.stop)
                 
                 # Update instance status
                 await db.execute(
@@ -277,12 +307,12 @@ class OdooInstanceManager:
                 logger.error(f"Error stopping instance {instance_id}: {e}")
                 return False
     
-    async def restart_instance(self, instance_id: int) -> bool:
+    async def restart_instance(self, instance_id: int, db: Optional[AsyncSession] = None) -> bool:
         """Restart Odoo instance"""
         if not self.docker_client:
             return False
         
-        async with AsyncSessionLocal() as db:
+        async with _session(db) as db:
             try:
                 # Get instance
                 result = await db.execute(select(OdooInstance).where(OdooInstance.id == instance_id))
@@ -292,8 +322,8 @@ class OdooInstanceManager:
                     return False
                 
                 # Restart container
-                container = self.docker_client.containers.get(instance.container_id)
-                container.restart()
+                container = await asyncio.to_thread(self.docker_client.containers.get, instance.container_id)
+                await asyncio.to_thread(container.restart)
                 
                 # Update instance status
                 await db.execute(
@@ -313,12 +343,9 @@ class OdooInstanceManager:
                 logger.error(f"Error restarting instance {instance_id}: {e}")
                 return False
     
-    async def delete_instance(self, instance_id: int) -> bool:
+    async def delete_instance(self, instance_id: int, db: Optional[AsyncSession] = None) -> bool:
         """Delete Odoo instance and its container"""
-        if not self.docker_client:
-            return False
-        
-        async with AsyncSessionLocal() as db:
+        async with _session(db) as db:
             try:
                 # Get instance
                 result = await db.execute(select(OdooInstance).where(OdooInstance.id == instance_id))
@@ -327,12 +354,15 @@ class OdooInstanceManager:
                 if not instance:
                     return False
                 
-                # Stop and remove container if exists
-                if instance.container_id:
+                # Stop and remove container if exists. Without Docker the container
+                # cannot be reached, the record and its port are freed anyway
+                if instance.container_id and not self.docker_client:
+                    logger.warning(f"Docker not available, container of instance {instance_id} left in place")
+                elif instance.container_id:
                     try:
-                        container = self.docker_client.containers.get(instance.container_id)
-                        container.stop()
-                        container.remove()
+                        container = await asyncio.to_thread(self.docker_client.containers.get, instance.container_id)
+                        await asyncio.to_thread(container.stop)
+                        await asyncio.to_thread(container.remove)
                         
                         # Remove volumes
                         try:
@@ -343,8 +373,8 @@ class OdooInstanceManager:
                             ]
                             for volume_name in volume_names:
                                 try:
-                                    volume = self.docker_client.volumes.get(volume_name)
-                                    volume.remove()
+                                    volume = await asyncio.to_thread(self.docker_client.volumes.get, volume_name)
+                                    await asyncio.to_thread(volume.remove)
                                 except:
                                     pass
                         except Exception as e:
@@ -353,8 +383,9 @@ class OdooInstanceManager:
                     except Exception as e:
                         logger.warning(f"Error removing container for instance {instance_id}: {e}")
                 
-                # Delete instance record
+                # Delete instance record and free its port
                 await db.delete(instance)
+                await release_port(db, instance.port)
                 await db.commit()
                 
                 logger.info(f"Instance {instance_id} deleted successfully")
@@ -379,8 +410,8 @@ class OdooInstanceManager:
                     return None
                 
                 # Get container stats
-                container = self.docker_client.containers.get(instance.container_id)
-                stats = container.stats(stream=False)
+                container = await asyncio.to_thread(self.docker_client.containers.get, instance.container_id)
+                stats = await asyncio.to_thread(container.stats, stream=False)
                 
                 # Calculate CPU usage
                 cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - stats['precpu_stats']['cpu_usage']['total_usage']
@@ -456,7 +487,7 @@ class OdooInstanceManager:
                     return False
                 
                 # Get container status
-                container = self.docker_client.containers.get(instance.container_id)
+                container = await asyncio.to_thread(self.docker_client.containers.get, instance.container_id)
                 container_status = container.status
                 
                 # Map container status to instance status
@@ -20,6 +20,18 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Password policy patterns, compiled once at import
+LOWERCASE_RE = re.compile(r'[a-z]')
+UPPERCASE_RE = re.compile(r'[A-Z]')
+DIGIT_RE = re.compile(r'\d')
+SPECIAL_RE = re.compile(r'[!@#$%^&*(),.?":{}|<>]')
+SEQUENTIAL_RE = re.compile(r'(012|123|234|345|456|567|678|789|890|abc|bcd|cde)')
+
+COMMON_PASSWORDS = frozenset({
+    "password", "123456", "password123", "admin", "qwerty",
+    "letmein", "welcome", "monkey", "dragon", "master"
+})
+
 class SecurityService:
     """Service for security management and threat detection"""
     
@@ -43,37 +55,34 @@ class SecurityService:
             score += 1
         
         # Character variety checks
-        if not re.search(r'[a-z]', password):
+        if not LOWERCASE_RE.search(password):
             issues.append("Password must contain lowercase letters")
         else:
             score += 1
             
-        if not re.search(r'[A-Z]', password):
+        if not UPPERCASE_RE.search(password):
             issues.append("Password must contain uppercase letters")
         else:
             score += 1
             
-        if not re.search(r'\d', password):
+        if not DIGIT_RE.search(password):
             issues.append("Password must contain numbers")
         else:
             score += 1
             
-        if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
+        if not SPECIAL_RE.search(password):
             issues.append("Password must contain special characters")
         else:
             score += 1
         
         # Common password check
-        common_passwords = [
-            "password", "123456", "password123", "admin", "qwerty",
-            "letmein", "welcome", "monkey", "dragon", "master"
-        ]
-        if password.lower() in common_passwords:
+        lowered = password.lower()
+        if lowered in COMMON_PASSWORDS:
             issues.append("Password is too common")
             score = max(0, score - 2)
         
         # Sequential characters check
-        if re.search(r'(012|123|234|345|456|567|678|789|890|abc|bcd|cde)', password.lower()):
+        if SEQUENTIAL_RE.search(lowered):
             issues.append("Password contains sequential characters")
             score = max(0, score - 1)
         
@@ -6,10 +6,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete, func
 from sqlalchemy.orm import selectinload
 from datetime import datetime
+from decimal import Decimal
 
 from app.models.tenant import Tenant
 from app.models.user import User
-from app.models.odoo_instance import OdooInstance
+from app.models.odoo_instance import OdooInstance, InstanceStatus
 from app.models.billing import Subscription
 from app.schemas.tenant import TenantCreate, TenantResponse, TenantUpdate
 from app.schemas.admin import TenantManagementResponse, TenantUpdateRequest
@@ -83,7 +84,7 @@ class TenantService:
         await self.db.execute(
             update(Tenant)
             .where(Tenant.id == tenant_id)
-            .values(**update_dict, updated_at=datetime.utcnow())
+            .values(**update_dict)
         )
         await self.db.commit()
         
@@ -121,13 +122,14 @@ class TenantService:
             Tenant,
             User.email.label('owner_email'),
             func.count(OdooInstance.id).label('instance_count')
-        ).join(User).outerjoin(OdooInstance).group_by(Tenant.id, User.email)
+        ).join(User).outerjoin(OdooInstance).group_by(Tenant.id, User.email).options(
+            selectinload(Tenant.subscriptions).selectinload(Subscription.plan)
+        )
         
         # Apply filters
         if search:
             query = query.where(
-                Tenant.name.ilike(f"%{search}%") |
-                Tenant.description.ilike(f"%{search}%") |
+                Tenant.search_text.ilike(f"%{search}%") |
                 User.email.ilike(f"%{search}%")
             )
         
@@ -142,22 +144,19 @@ class TenantService:
         # Convert to response format
         tenants_list = []
         for tenant, owner_email, instance_count in tenants_data:
-            # Get subscription info
-            subscription_query = select(Subscription).where(
-                Subscription.tenant_id == tenant.id
-            ).order_by(Subscription.created_at.desc())
-            subscription_result = await self.db.execute(subscription_query)
-            subscription = subscription_result.scalar_one_or_none()
+            # Latest subscription, from the batch-loaded collection
+            subscription = max(tenant.subscriptions, key=lambda sub: sub.created_at, default=None)
             
-            tenants_list.append(TenantManagementResponse(
+            # Rows come straight from the database, skip re-validation
+            tenants_list.append(TenantManagementResponse.model_construct(
                 id=tenant.id,
                 name=tenant.name,
                 owner_email=owner_email,
                 status=tenant.status,
                 instance_count=instance_count or 0,
                 subscription_status=subscription.status if subscription else None,
-                monthly_cost=subscription.plan.price if subscription and subscription.plan else 0,
-                storage_used_gb=tenant.storage_used_gb or 0,
+                monthly_cost=subscription.plan.price if subscription and subscription.plan else Decimal('0'),
+                storage_used_gb=float(tenant.storage_used_gb or 0),
                 created_at=tenant.created_at,
                 last_activity=tenant.last_activity
             ))
@@ -174,7 +173,7 @@ class TenantService:
         await self.db.execute(
             update(Tenant)
             .where(Tenant.id == tenant_id)
-            .values(**update_dict, updated_at=datetime.utcnow())
+            .values(**update_dict)
         )
         await self.db.commit()
         
@@ -190,9 +189,9 @@ class TenantService:
         instance_stats = await self.db.execute(
             select(
                 func.count(OdooInstance.id).label('total'),
-                func.count().filter(OdooInstance.status == 'running').label('running'),
-                func.count().filter(OdooInstance.status == 'stopped').label('stopped'),
-                func.count().filter(OdooInstance.status == 'error').label('error')
+                func.count().filter(OdooInstance.status == InstanceStatus.RUNNING).label('running'),
+                func.count().filter(OdooInstance.status == InstanceStatus.STOPPED).label('stopped'),
+                func.count().filter(OdooInstance.status == InstanceStatus.ERROR).label('error')
             ).where(OdooInstance.tenant_id == tenant_id)
         )
         stats = instance_stats.first()
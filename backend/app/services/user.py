@@ -3,15 +3,16 @@ User management service
 """
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import select, update, delete, func, distinct
 from sqlalchemy.orm import selectinload
 from datetime import datetime
 
 from app.models.user import User
 from app.models.tenant import Tenant
+from app.models.odoo_instance import OdooInstance
 from app.core.security import get_password_hash, verify_password
 from app.schemas.auth import UserCreate, UserResponse
-from app.schemas.admin import UserManagementResponse, UserUpdateRequest
+from app.schemas.admin import UserManagementResponse, UserUpdateRequest, UserManagementList
 
 class UserService:
     """Service for user management operations"""
@@ -72,7 +73,7 @@ class UserService:
         await self.db.execute(
             update(User)
             .where(User.id == user_id)
-            .values(**update_data, updated_at=datetime.utcnow())
+            .values(**update_data)
         )
         await self.db.commit()
         
@@ -112,16 +113,13 @@ class UserService:
         """Get paginated list of users for admin management"""
         query = select(
             User,
-            func.count(Tenant.id).label('tenant_count')
-        ).outerjoin(Tenant).group_by(User.id)
+            func.count(distinct(Tenant.id)).label('tenant_count'),
+            func.count(distinct(OdooInstance.id)).label('instance_count')
+        ).outerjoin(Tenant).outerjoin(OdooInstance, OdooInstance.tenant_id == Tenant.id).group_by(User.id)
         
         # Apply filters
         if search:
-            query = query.where(
-                User.email.ilike(f"%{search}%") |
-                User.full_name.ilike(f"%{search}%") |
-                User.company.ilike(f"%{search}%")
-            )
+            query = query.where(User.search_text.ilike(f"%{search}%"))
         
         if is_active is not None:
             query = query.where(User.is_active == is_active)
@@ -136,15 +134,8 @@ class UserService:
         
         # Convert to response format
         users_list = []
-        for user, tenant_count in users_data:
-            # Get instance count for this user
-            instance_count_query = select(func.count()).select_from(
-                select(Tenant.id).where(Tenant.owner_id == user.id).subquery()
-            )
-            instance_result = await self.db.execute(instance_count_query)
-            instance_count = instance_result.scalar() or 0
-            
-            users_list.append(UserManagementResponse(
+        for user, tenant_count, instance_count in users_data:
+            users_list.append(dict(
                 id=user.id,
                 email=user.email,
                 full_name=user.full_name,
@@ -153,12 +144,12 @@ class UserService:
                 is_verified=user.is_verified,
                 is_admin=user.is_admin,
                 tenant_count=tenant_count or 0,
-                instance_count=instance_count,
+                instance_count=instance_count or 0,
                 last_login=user.last_login,
                 created_at=user.created_at
             ))
         
-        return users_list
+        return UserManagementList.validate_python(users_list)
     
     async def update_user_admin(self, user_id: int, update_data: UserUpdateRequest) -> Optional[User]:
         """Update user by admin"""
@@ -170,7 +161,7 @@ class UserService:
         await self.db.execute(
             update(User)
             .where(User.id == user_id)
-            .values(is_verified=True, updated_at=datetime.utcnow())
+            .values(is_verified=True)
         )
         await self.db.commit()
         return True
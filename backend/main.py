@@ -3,20 +3,30 @@ Odoo SaaS Platform - Main FastAPI Application
 """
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import uvicorn
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, AsyncSessionLocal, partition_maintenance
 from app.api.v1 import auth, admin, tenants, billing, odoo_instances, monitoring, security, backup
 from app.core.security import get_current_user
+from app.services.billing import BillingService, usage_buffer
+from app.services.monitoring import container_stats
 from app.models.user import User
 
-logging.basicConfig(level=logging.INFO)
+# Handlers only enqueue records, a listener thread does the actual writes so
+# request handlers never block on log output
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
@@ -26,11 +36,28 @@ async def lifespan(app: FastAPI):
     
     # Initialize database
     await init_db()
+    
+    # Warm the subscription plan cache
+    async with AsyncSessionLocal() as db:
+        await BillingService(db).get_plans()
+    
+    # Start the usage record writer
+    usage_buffer.start()
+    
+    # Start polling container stats for the instance metrics
+    container_stats.start()
+    
+    # Keep creating monthly partitions ahead while the process is up
+    partition_maintenance.start()
     logger.info("✅ Application started")
     
     yield
     
+    await partition_maintenance.stop()
+    await container_stats.stop()
+    await usage_buffer.stop()
     logger.info("🛑 Shutting down Odoo SaaS Platform...")
+    log_listener.stop()
 
 # Create FastAPI app
 app = FastAPI(
@@ -39,6 +66,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -0,0 +1,59 @@
+"""
+Shared test fixtures. The tests run against the Postgres database named by
+TEST_DATABASE_URL, which is dropped and recreated for every test, and are
+skipped when it is not set
+"""
+import os
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from app.core.database import Base
+from app.models import User, Tenant
+from app.models.odoo_instance import INSTANCE_PORTS_SEED
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+@pytest.fixture
+async def db_engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    
+    # No pool, every test runs on its own event loop
+    engine = create_async_engine(
+        TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
+        poolclass=NullPool
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(INSTANCE_PORTS_SEED)
+    
+    yield engine
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+@pytest.fixture
+def session_factory(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+@pytest.fixture
+async def db(session_factory):
+    async with session_factory() as session:
+        yield session
+
+@pytest.fixture
+async def owner(db):
+    user = User(email="owner@example.com", hashed_password="not-a-hash", full_name="Tenant Owner")
+    db.add(user)
+    await db.commit()
+    return user
+
+@pytest.fixture
+async def tenant(db, owner):
+    tenant = Tenant(name="Acme", owner_id=owner.id)
+    db.add(tenant)
+    await db.commit()
+    return tenant
@@ -0,0 +1,55 @@
+"""
+Tests for the monitoring service
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.models import (
+    OdooInstance, InstanceStatus, SubscriptionPlan, Subscription, SubscriptionStatus, AuditLog
+)
+from app.services.monitoring import MonitoringService
+
+async def test_get_tenant_metrics(db, tenant):
+    plan = SubscriptionPlan(name="Starter", price=29)
+    db.add(plan)
+    await db.flush()
+    
+    now = datetime.now(timezone.utc)
+    db.add_all([
+        OdooInstance(
+            tenant_id=tenant.id, container_name="odoo-acme-1", port=8070,
+            database_name="acme_1", admin_password="secret", status=InstanceStatus.RUNNING
+        ),
+        OdooInstance(
+            tenant_id=tenant.id, container_name="odoo-acme-2", port=8071,
+            database_name="acme_2", admin_password="secret", status=InstanceStatus.STOPPED
+        ),
+        Subscription(
+            tenant_id=tenant.id, plan_id=plan.id, status=SubscriptionStatus.ACTIVE,
+            current_period_start=now, current_period_end=now + timedelta(days=30)
+        ),
+        AuditLog(
+            action="tenant_created", resource_type="tenant",
+            resource_id=str(tenant.id), resource_id_int=tenant.id
+        ),
+        # Same numeric id on another resource type, not part of the tenant's activity
+        AuditLog(
+            action="user_updated", resource_type="user",
+            resource_id=str(tenant.id), resource_id_int=tenant.id
+        ),
+    ])
+    await db.commit()
+    
+    metrics = await MonitoringService(db).get_tenant_metrics(tenant.id)
+    
+    assert "error" not in metrics
+    assert metrics["tenant_name"] == "Acme"
+    assert metrics["instances"] == {"total": 2, "running": 1, "stopped": 1}
+    assert metrics["subscription"]["plan_id"] == plan.id
+    assert metrics["subscription"]["status"] == SubscriptionStatus.ACTIVE
+    assert metrics["usage"]["max_users"] == tenant.max_users
+    assert [activity["action"] for activity in metrics["recent_activities"]] == ["tenant_created"]
+
+async def test_get_tenant_metrics_unknown_tenant(db):
+    metrics = await MonitoringService(db).get_tenant_metrics(999)
+    
+    assert metrics == {"error": "Tenant not found"}
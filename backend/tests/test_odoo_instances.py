@@ -0,0 +1,67 @@
+"""
+Tests for the Odoo instance control endpoints
+"""
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.api.v1 import odoo_instances
+from app.models import OdooInstance, InstanceStatus, InstancePort
+from app.services.odoo_manager import instance_manager, get_next_available_port
+
+@pytest.fixture
+async def client(session_factory, owner):
+    app = FastAPI()
+    app.include_router(odoo_instances.router, prefix="/api/v1/odoo")
+    
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+            await session.commit()
+    
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: owner
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+async def instance(db, tenant):
+    instance = OdooInstance(
+        tenant_id=tenant.id, container_id="4f1c2a9e", container_name="odoo-acme-1",
+        port=await get_next_available_port(db), database_name="acme_1",
+        admin_password="secret", status=InstanceStatus.STOPPED
+    )
+    db.add(instance)
+    await db.commit()
+    return instance
+
+async def test_delete_instance_without_docker(client, db, instance, monkeypatch):
+    monkeypatch.setattr(instance_manager, "docker_client", None)
+    
+    response = await client.delete(f"/api/v1/odoo/{instance.id}")
+    
+    assert response.status_code == 200
+    assert await db.scalar(select(OdooInstance).where(OdooInstance.id == instance.id)) is None
+    assert await db.scalar(select(InstancePort.used).where(InstancePort.port == instance.port)) is False
+
+@pytest.mark.parametrize("action", ["start", "stop", "restart"])
+async def test_control_instance_without_docker(client, instance, monkeypatch, action):
+    monkeypatch.setattr(instance_manager, "docker_client", None)
+    
+    response = await client.post(f"/api/v1/odoo/{instance.id}/{action}")
+    
+    assert response.status_code == 503
+
+async def test_start_instance_without_container(client, db, instance, monkeypatch):
+    # Only the presence of a client is checked before the container
+    monkeypatch.setattr(instance_manager, "docker_client", object())
+    instance.container_id = None
+    await db.commit()
+    
+    response = await client.post(f"/api/v1/odoo/{instance.id}/start")
+    
+    assert response.status_code == 409